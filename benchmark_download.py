@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: yt-dlp's single-connection download vs the ranged engine.
+
+Starts a local range-capable HTTP stand-in that throttles every connection
+(like the TikTok/Instagram/X CDNs do) and downloads the same file both ways.
+
+    python benchmark_download.py [size_mb] [per_connection_mbps] [connections]
+"""
+
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yt_dlp
+
+from range_download import ranged_download
+
+RANGE_RE = re.compile(r'bytes=(\d+)-(\d*)')
+WRITE_SIZE = 64 * 1024
+
+
+def make_handler(payload: bytes, bytes_per_second: float):
+    class ThrottledRangeHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            start, end = 0, len(payload) - 1
+            match = RANGE_RE.match(self.headers.get('Range') or '')
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2) or end), end)
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(payload)}')
+            else:
+                self.send_response(200)
+            self.send_header('Content-Type', 'video/mp4')
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.end_headers()
+
+            # Per-connection throttle
+            started = time.monotonic()
+            sent = 0
+            try:
+                for offset in range(start, end + 1, WRITE_SIZE):
+                    chunk = payload[offset:min(offset + WRITE_SIZE, end + 1)]
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+                    ahead = sent / bytes_per_second - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+            except ConnectionError:
+                pass  # probes (extract_info, range checks) hang up early
+
+    return ThrottledRangeHandler
+
+
+def main(size_mb: float = 16, mbps: float = 16, connections: int = 4):
+    payload = os.urandom(int(size_mb * 1024 * 1024))
+    expected = hashlib.sha256(payload).hexdigest()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(payload, mbps * 1024 * 1024 / 8))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+    print(f"{size_mb} MB file, {mbps} Mbit/s per connection")
+
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            options = {'quiet': True, 'noprogress': True, 'outtmpl': os.path.join(temp_dir, 'native.%(ext)s')}
+            with yt_dlp.YoutubeDL(options) as ydl:
+                info = ydl.extract_info(url, download=False)
+
+                started = time.monotonic()
+                ydl.process_ie_result(dict(info), download=True)
+                native_seconds = time.monotonic() - started
+
+                ranged_path = os.path.join(temp_dir, 'ranged.mp4')
+                started = time.monotonic()
+                ranged_download(ydl, info, ranged_path, 'benchmark', connections)
+                ranged_seconds = time.monotonic() - started
+
+            for name, path in [('native', os.path.join(temp_dir, 'native.mp4')), ('ranged', ranged_path)]:
+                with open(path, 'rb') as f:
+                    assert hashlib.sha256(f.read()).hexdigest() == expected, f"{name} download is corrupt"
+
+        print(f"  yt-dlp native (1 connection)  {native_seconds:6.2f} s  {size_mb / native_seconds:6.2f} MB/s")
+        print(f"  ranged ({connections} connections)        {ranged_seconds:6.2f} s  {size_mb / ranged_seconds:6.2f} MB/s")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        size_mb=float(args[0]) if len(args) > 0 else 16,
+        mbps=float(args[1]) if len(args) > 1 else 16,
+        connections=int(args[2]) if len(args) > 2 else 4,
+    )
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: cost of encoding one /extract response.
+
+Compares FastAPI's default path for a Pydantic response_model (validate,
+serialize, json.dumps) with returning the slotted ExtractionResponse
+through ORJSONResponse.
+"""
+
+import sys
+import timeit
+from typing import Optional
+
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import BaseModel
+
+from main import ExtractionResponse, ORJSONResponse, summarize_formats
+
+
+class PydanticExtractionResponse(BaseModel):
+    """The response model before the switch"""
+    success: bool
+    video_path: Optional[str] = None
+    thumbnail_path: Optional[str] = None
+    metadata: dict = {}
+    error: Optional[str] = None
+    cached: bool = False
+
+
+def sample_metadata(format_count: int = 20) -> dict:
+    formats = [
+        {
+            'format_id': f"h264_{height}p_{i}",
+            'ext': 'mp4',
+            'width': height * 16 // 9,
+            'height': height,
+            'fps': 30,
+            'vcodec': 'h264',
+            'acodec': 'aac',
+            'tbr': 800.0 + i,
+            'filesize': 1_500_000 + i,
+        }
+        for i, height in enumerate([360, 480, 540, 720, 1080] * (format_count // 5))
+    ]
+    return {
+        'title': 'Sample video title with some emoji 🎉',
+        'description': 'A fairly typical caption #fyp #video ' * 8,
+        'author': 'someone',
+        'duration': 42,
+        'platform': 'tiktok',
+        'thumbnail_url': 'https://p16-sign.tiktokcdn.com/obj/thumbnail.jpeg?x-expires=1700000000&x-signature=abc',
+        'upload_date': '20240101',
+        'view_count': 123456,
+        'like_count': 7890,
+        'comment_count': 123,
+        'formats': summarize_formats(formats),
+        'url': 'https://www.tiktok.com/@someone/video/7300000000000000000',
+        'timings': {'download': 1234, 'upload_video': 567, 'upload_thumbnail': 89, 'total': 1890},
+    }
+
+
+def main(iterations: int = 20000):
+    metadata = sample_metadata()
+    fields = dict(success=True, video_path='video_abc.mp4', thumbnail_path='thumb_abc.jpg', metadata=metadata)
+    response_field = create_response_field(name='Response', type_=PydanticExtractionResponse, mode='serialization')
+
+    async def _pydantic():
+        content = await serialize_response(field=response_field, response_content=PydanticExtractionResponse(**fields))
+        return JSONResponse(content).body
+
+    def _before():
+        # serialize_response never actually suspends here; drive the
+        # coroutine by hand so event loop overhead isn't measured
+        coro = _pydantic()
+        try:
+            coro.send(None)
+        except StopIteration as done:
+            return done.value
+
+    def _after():
+        return ORJSONResponse(ExtractionResponse(**fields).to_dict()).body
+
+    assert orjson_equal(_before(), _after())
+    print(f"Response size: {len(_after())} bytes, {iterations} iterations")
+    for name, func in [('pydantic model + json (before)', _before), ('slotted dataclass + orjson (after)', _after)]:
+        seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+        print(f"  {name:36s} {seconds / iterations * 1e6:8.1f} µs/response")
+
+
+def orjson_equal(a: bytes, b: bytes) -> bool:
+    return orjson.loads(a) == orjson.loads(b)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -1,12 +1,16 @@
+import functools
 import yt_dlp
 import requests
 import re
 import json
-import time
 import random
 from typing import Optional, Dict, Any
 import logging
 
+from http_client import http_clients
+from url_normalizer import parse_video_key
+from hedging import hedged_first_sync
+
 logger = logging.getLogger(__name__)
 
 class InstagramCustomExtractor:
@@ -15,14 +19,15 @@ class InstagramCustomExtractor:
     """
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+        # Shared keep-alive pool; headers are sent per request
+        self.session = http_clients.shared_sync()
+        self.headers = {
             'User-Agent': 'Instagram 76.0.0.15.395 Android (24/7.0; 640dpi; 1440x2560; samsung; SM-G930F; herolte; samsungexynos8890; en_US)',
             'Accept-Language': 'en-US,en;q=0.9',
             'Accept-Encoding': 'gzip, deflate',
             'Accept': '*/*',
             'Connection': 'keep-alive',
-        })
+        }
     
     def extract_instagram_video(self, url: str) -> Optional[Dict[str, Any]]:
         """
@@ -45,18 +50,8 @@ class InstagramCustomExtractor:
         """
         Extract video ID from Instagram URL
         """
-        patterns = [
-            r'instagram\.com/p/([^/]+)/?',
-            r'instagram\.com/reel/([^/]+)/?',
-            r'instagram\.com/tv/([^/]+)/?',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        
-        return None
+        key = parse_video_key(url)
+        return key.video_id if key and key.platform == 'instagram' else None
     
     def _extract_with_alternative_methods(self, url: str, video_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -68,16 +63,9 @@ class InstagramCustomExtractor:
             self._method_public_api,
         ]
         
-        for method in methods:
-            try:
-                result = method(url, video_id)
-                if result:
-                    return result
-            except Exception as e:
-                logger.warning(f"Method {method.__name__} failed: {e}")
-                continue
-        
-        return None
+        # Race the methods (staggered by the hedge delay) instead of
+        # waiting for each one to time out before trying the next
+        return hedged_first_sync([functools.partial(method, url, video_id) for method in methods])
     
     def _method_oembed(self, url: str, video_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -86,7 +74,7 @@ class InstagramCustomExtractor:
         oembed_url = f"https://www.instagram.com/oembed/?url={requests.utils.quote(url)}"
         
         try:
-            response = self.session.get(oembed_url, timeout=10)
+            response = self.session.get(oembed_url, headers=self.headers, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 return {
@@ -108,7 +96,7 @@ class InstagramCustomExtractor:
         graphql_url = f"https://www.instagram.com/p/{video_id}/?hl=en"
         
         try:
-            response = self.session.get(graphql_url, timeout=10)
+            response = self.session.get(graphql_url, headers=self.headers, timeout=10)
             if response.status_code == 200:
                 html = response.text
                 
@@ -150,7 +138,6 @@ class InstagramCustomExtractor:
             try:
                 # This is a placeholder - real implementation would call actual APIs
                 logger.info(f"Trying API service: {service}")
-                time.sleep(1)  # Rate limiting
             except Exception as e:
                 logger.warning(f"API service {service} failed: {e}")
                 continue
@@ -163,14 +150,15 @@ class TikTokCustomExtractor:
     """
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+        # Shared keep-alive pool; headers are sent per request
+        self.session = http_clients.shared_sync()
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'en-us,en;q=0.5',
             'Accept-Encoding': 'gzip, deflate',
             'Connection': 'keep-alive',
-        })
+        }
     
     def extract_tiktok_video(self, url: str) -> Optional[Dict[str, Any]]:
         """
@@ -187,7 +175,7 @@ class TikTokCustomExtractor:
         Alternative TikTok extraction methods
         """
         try:
-            response = self.session.get(url, timeout=10)
+            response = self.session.get(url, headers=self.headers, timeout=10)
             if response.status_code == 200:
                 html = response.text
                 
@@ -274,6 +262,17 @@ class CustomExtractor:
             'fallback_used': False
         }
 
+_custom_extractor = None
+
+def _shared_extractors() -> CustomExtractor:
+    """
+    One CustomExtractor per process instead of one per _real_extract call
+    """
+    global _custom_extractor
+    if _custom_extractor is None:
+        _custom_extractor = CustomExtractor()
+    return _custom_extractor
+
 # Custom yt-dlp extractors
 class InstagramCustomYTDLExtractor(yt_dlp.extractor.common.InfoExtractor):
     IE_NAME = 'instagram:custom'
@@ -283,14 +282,14 @@ class InstagramCustomYTDLExtractor(yt_dlp.extractor.common.InfoExtractor):
         """
         Custom Instagram extractor for yt-dlp
         """
-        custom_extractor = InstagramCustomExtractor()
-        result = custom_extractor.extract_instagram_video(url)
+        result = _shared_extractors().instagram_extractor.extract_instagram_video(url)
         
         if not result:
             self.raise_error('Failed to extract Instagram video')
         
+        key = parse_video_key(url)
         return {
-            'id': url.split('/')[-2],
+            'id': key.video_id if key else url.rstrip('/').split('/')[-1],
             'title': result.get('title', 'Instagram Video'),
             'description': '',
             'thumbnail': result.get('thumbnail_url', ''),
@@ -305,14 +304,14 @@ class TikTokCustomYTDLExtractor(yt_dlp.extractor.common.InfoExtractor):
         """
         Custom TikTok extractor for yt-dlp
         """
-        custom_extractor = TikTokCustomExtractor()
-        result = custom_extractor.extract_tiktok_video(url)
+        result = _shared_extractors().tiktok_extractor.extract_tiktok_video(url)
         
         if not result:
             self.raise_error('Failed to extract TikTok video')
         
+        key = parse_video_key(url)
         return {
-            'id': url.split('/')[-1],
+            'id': key.video_id if key else url.rstrip('/').split('/')[-1],
             'title': result.get('title', 'TikTok Video'),
             'description': '',
             'thumbnail': result.get('thumbnail_url', ''),
@@ -0,0 +1,153 @@
+"""
+Format selection policies (height, bitrate, size, codec) and the download size guard
+"""
+
+import json
+import logging
+import os
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Our own YoutubeDL param: byte limit enforced by the size guard progress hook
+MAX_DOWNLOAD_BYTES = 'max_download_bytes'
+
+# Policy fields that are upper limits: requests may lower them, never raise them
+LIMITS = ('max_height', 'max_bitrate', 'max_filesize')
+
+
+class FileTooLargeError(Exception):
+    """The selected format is (or turned out to be) larger than the policy allows"""
+
+
+class FormatPolicy(NamedTuple):
+    max_height: Optional[int] = None
+    max_bitrate: Optional[int] = None  # total bitrate in kbps
+    max_filesize: Optional[int] = None  # bytes
+    codec: Optional[str] = None  # preferred video codec, e.g. "h264"
+
+    def merged(self, **overrides) -> 'FormatPolicy':
+        """
+        Copy with every override that isn't None applied
+        """
+        return self._replace(**{k: v for k, v in overrides.items() if v is not None})
+
+    def restricted(self, **overrides) -> 'FormatPolicy':
+        """
+        Copy with a client's overrides applied: limits can only go down
+        """
+        for name in LIMITS:
+            limit = getattr(self, name)
+            if limit and overrides.get(name) is not None:
+                overrides[name] = min(overrides[name], limit)
+        return self.merged(**overrides)
+
+    def ydl_options(self) -> dict:
+        """
+        yt-dlp options for this policy.
+
+        Bitrate and size are hard filters (formats with unknown values still
+        pass); height and codec only steer sorting, so a video without a
+        rendition at or below ``max_height`` gets its smallest one instead of
+        failing. When nothing passes the filters the sort order alone picks
+        the format, and the size guard still applies.
+        """
+        filters = ''
+        if self.max_bitrate:
+            filters += f'[tbr<=?{self.max_bitrate}]'
+        if self.max_filesize:
+            filters += f'[filesize<=?{self.max_filesize}][filesize_approx<=?{self.max_filesize}]'
+
+        format_sort = []
+        if self.max_height:
+            format_sort.append(f'res:{self.max_height}')
+        if self.codec:
+            format_sort.append(f'vcodec:{self.codec}')
+
+        return {
+            'format': f'best[ext=mp4]{filters}/best{filters}/best[ext=mp4]/best',
+            'format_sort': format_sort,
+            MAX_DOWNLOAD_BYTES: self.max_filesize,
+        }
+
+    def cache_suffix(self) -> str:
+        return ','.join(f"{name}={value}" for name, value in self._asdict().items() if value is not None)
+
+
+def estimated_size(info: dict) -> Optional[int]:
+    """
+    Expected download size of the selected format(s) from filesize or
+    filesize_approx, None when any part is unknown
+    """
+    parts = info.get('requested_formats') or [info]
+    total = 0
+    for part in parts:
+        size = part.get('filesize') or part.get('filesize_approx')
+        if not size:
+            return None
+        total += size
+    return int(total)
+
+
+def check_estimated_size(info: dict, max_bytes: Optional[int]):
+    """
+    Refuse before downloading when the estimate is already over the limit
+    """
+    size = estimated_size(info)
+    if max_bytes and size and size > max_bytes:
+        raise FileTooLargeError(f"Estimated size {size} bytes exceeds max_filesize of {max_bytes} bytes")
+
+
+def check_downloaded_size(size: int, max_bytes: Optional[int]):
+    if max_bytes and size > max_bytes:
+        raise FileTooLargeError(f"Download exceeds max_filesize of {max_bytes} bytes ({size} bytes), aborted")
+
+
+def install_size_guard(ydl):
+    """
+    Abort downloads that grow past ``ydl.params[MAX_DOWNLOAD_BYTES]``: as soon
+    as the server announces a larger size, or mid-stream when it didn't
+    """
+    def _guard(status: dict):
+        if status.get('status') != 'downloading':
+            return
+        max_bytes = ydl.params.get(MAX_DOWNLOAD_BYTES)
+        check_downloaded_size(max(status.get('total_bytes') or 0, status.get('downloaded_bytes') or 0), max_bytes)
+
+    ydl.add_progress_hook(_guard)
+
+
+def _optional_int(value) -> Optional[int]:
+    value = int(float(value or 0))
+    return value or None
+
+
+class FormatPolicies:
+    """
+    Default policy, per-platform overrides and per-request overrides on top.
+    Per-request overrides can tighten the platform's limits but not lift them.
+    """
+
+    def __init__(self, default: FormatPolicy, platforms: dict):
+        self.default = default
+        self.platforms = platforms
+
+    @classmethod
+    def from_env(cls) -> 'FormatPolicies':
+        default = FormatPolicy(
+            max_height=_optional_int(os.getenv('FORMAT_MAX_HEIGHT', 720)),
+            max_bitrate=_optional_int(os.getenv('FORMAT_MAX_BITRATE', 0)),
+            max_filesize=_optional_int(os.getenv('FORMAT_MAX_FILESIZE', 200 * 1024 * 1024)),
+            codec=os.getenv('FORMAT_CODEC', 'h264') or None,
+        )
+        platforms = {}
+        try:
+            for platform, overrides in json.loads(os.getenv('FORMAT_PLATFORM_POLICIES') or '{}').items():
+                platforms[platform] = default.merged(**overrides)
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid FORMAT_PLATFORM_POLICIES: {e}")
+        return cls(default, platforms)
+
+    def for_request(self, platform: str, overrides: Optional[dict] = None) -> FormatPolicy:
+        policy = self.platforms.get(platform, self.default)
+        return policy.restricted(**overrides) if overrides else policy
@@ -0,0 +1,114 @@
+"""
+Hedged execution: race alternative strategies and keep the first good result
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds between starting one strategy and the next; 0 starts them all at once
+HEDGE_DELAY = float(os.getenv('HEDGE_DELAY', 0.25))
+
+_hedge_pool = ThreadPoolExecutor(max_workers=int(os.getenv('HEDGE_WORKERS', 16)), thread_name_prefix='hedge')
+
+
+def _name(strategy: Callable) -> str:
+    strategy = getattr(strategy, 'func', strategy)  # unwrap functools.partial
+    return getattr(strategy, '__name__', repr(strategy))
+
+
+async def hedged_first(strategies: List[Callable[[], Awaitable[Any]]],
+                       is_success: Callable[[Any], bool] = bool,
+                       hedge_delay: float = HEDGE_DELAY) -> Optional[Any]:
+    """
+    Start ``strategies`` staggered by ``hedge_delay`` and return the first
+    result that passes ``is_success``, cancelling the ones still running.
+
+    A strategy that fails early starts the next one right away. If none
+    succeeds the last result (or None when they all raised) is returned.
+    """
+    pending = set()
+    waiting = list(strategies)
+    names = {}
+    last_result = None
+
+    def _start_next():
+        strategy = waiting.pop(0)
+        task = asyncio.ensure_future(strategy())
+        names[task] = _name(strategy)
+        pending.add(task)
+
+    try:
+        while waiting or pending:
+            if waiting and not pending:
+                _start_next()
+            timeout = hedge_delay if waiting else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Nothing finished within the hedge delay: start the next strategy
+                _start_next()
+                continue
+
+            for task in done:
+                pending.discard(task)
+                if task.exception() is not None:
+                    logger.warning(f"Strategy {names[task]} failed: {task.exception()}")
+                    continue
+                result = task.result()
+                if is_success(result):
+                    logger.info(f"Strategy {names[task]} won the race")
+                    return result
+                last_result = result
+        return last_result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def hedged_first_sync(strategies: List[Callable[[], Any]],
+                      is_success: Callable[[Any], bool] = bool,
+                      hedge_delay: float = HEDGE_DELAY) -> Optional[Any]:
+    """
+    Thread-based ``hedged_first`` for blocking strategies.
+
+    Losing strategies that already started can't be interrupted; their
+    results are simply ignored.
+    """
+    pending = set()
+    waiting = list(strategies)
+    names = {}
+    last_result = None
+
+    def _start_next():
+        strategy = waiting.pop(0)
+        future = _hedge_pool.submit(strategy)
+        names[future] = _name(strategy)
+        pending.add(future)
+
+    try:
+        while waiting or pending:
+            if waiting and not pending:
+                _start_next()
+            done, _ = wait(pending, timeout=hedge_delay if waiting else None, return_when=FIRST_COMPLETED)
+            if not done:
+                _start_next()
+                continue
+
+            for future in done:
+                pending.discard(future)
+                if future.exception() is not None:
+                    logger.warning(f"Strategy {names[future]} failed: {future.exception()}")
+                    continue
+                result = future.result()
+                if is_success(result):
+                    logger.info(f"Strategy {names[future]} won the race")
+                    return result
+                last_result = result
+        return last_result
+    finally:
+        for future in pending:
+            future.cancel()
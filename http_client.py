@@ -0,0 +1,164 @@
+"""
+Shared, pooled HTTP clients for storage uploads and custom extractors
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Iterator
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HTTPClientPool:
+    """
+    Application-wide HTTP clients with keep-alive connection pools.
+
+    One shared client serves the platform endpoints (oEmbed, HTML pages),
+    and every Supabase project (tenant) gets its own client so a slow
+    tenant can't exhaust the connections of the others. Async clients are
+    used from the event loop, sync ones from worker threads. Tenant clients
+    are leased for the duration of their requests: the least recently used
+    one is evicted past ``max_tenants``, but only closed once idle.
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20,
+                 keepalive_expiry: float = 30.0, timeout: float = 15.0,
+                 http2: bool = True, max_tenants: int = 64):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout)
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.max_tenants = max_tenants
+        self._shared = None
+        self._shared_sync = None
+        self._tenants = OrderedDict()
+        self._tenants_sync = OrderedDict()
+        self._leases = {}  # id(client) -> leases in progress
+        self._retired = {}  # id(client) -> evicted client waiting for its leases to end
+
+    @classmethod
+    def from_env(cls) -> 'HTTPClientPool':
+        return cls(
+            max_connections=int(os.getenv('HTTP_MAX_CONNECTIONS', 100)),
+            max_keepalive=int(os.getenv('HTTP_MAX_KEEPALIVE', 20)),
+            keepalive_expiry=float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 30)),
+            timeout=float(os.getenv('HTTP_TIMEOUT', 15)),
+            http2=os.getenv('HTTP2_ENABLED', 'true').lower() == 'true',
+            max_tenants=int(os.getenv('HTTP_MAX_TENANT_CLIENTS', 64)),
+        )
+
+    def _client_options(self) -> dict:
+        return {
+            'limits': self.limits,
+            'timeout': self.timeout,
+            'http2': self.http2,
+            'follow_redirects': True,
+        }
+
+    def shared(self) -> httpx.AsyncClient:
+        """
+        Async client for platform requests
+        """
+        if self._shared is None:
+            self._shared = httpx.AsyncClient(**self._client_options())
+        return self._shared
+
+    def shared_sync(self) -> httpx.Client:
+        """
+        Sync client for platform requests made from worker threads
+        """
+        if self._shared_sync is None:
+            self._shared_sync = httpx.Client(**self._client_options())
+        return self._shared_sync
+
+    def _tenant_client(self, clients: OrderedDict, supabase_url: str, factory):
+        key = supabase_url.rstrip('/')
+        client = clients.get(key)
+        if client is None:
+            client = factory(**self._client_options())
+            clients[key] = client
+            if len(clients) > self.max_tenants:
+                _, evicted = clients.popitem(last=False)
+                if id(evicted) in self._leases:
+                    self._retired[id(evicted)] = evicted
+                else:
+                    self._close_later(evicted)
+        else:
+            clients.move_to_end(key)
+        return client
+
+    @contextlib.contextmanager
+    def _lease(self, clients: OrderedDict, supabase_url: str, factory) -> Iterator:
+        client = self._tenant_client(clients, supabase_url, factory)
+        key = id(client)
+        self._leases[key] = self._leases.get(key, 0) + 1
+        try:
+            yield client
+        finally:
+            self._leases[key] -= 1
+            if not self._leases[key]:
+                del self._leases[key]
+                retired = self._retired.pop(key, None)
+                if retired is not None:
+                    self._close_later(retired)
+
+    def tenant(self, supabase_url: str) -> 'contextlib.AbstractContextManager[httpx.AsyncClient]':
+        """
+        Lease the async client dedicated to one Supabase project
+        """
+        return self._lease(self._tenants, supabase_url, httpx.AsyncClient)
+
+    def tenant_sync(self, supabase_url: str) -> 'contextlib.AbstractContextManager[httpx.Client]':
+        """
+        Lease the sync client dedicated to one Supabase project, for worker
+        threads. Take the lease on the event loop around the blocking call.
+        """
+        return self._lease(self._tenants_sync, supabase_url, httpx.Client)
+
+    @staticmethod
+    def _close_later(client):
+        if isinstance(client, httpx.AsyncClient):
+            try:
+                asyncio.get_running_loop().create_task(client.aclose())
+            except RuntimeError:
+                pass
+        else:
+            client.close()
+
+    def stats(self) -> dict:
+        return {
+            'http2': self.http2,
+            'tenants': len(self._tenants) + len(self._tenants_sync),
+            'retired': len(self._retired),
+        }
+
+    async def aclose(self):
+        retired = list(self._retired.values())
+        for client in [self._shared, *self._tenants.values(), *retired]:
+            if isinstance(client, httpx.AsyncClient):
+                await client.aclose()
+        for client in [self._shared_sync, *self._tenants_sync.values(), *retired]:
+            if isinstance(client, httpx.Client):
+                client.close()
+        self._shared = self._shared_sync = None
+        self._tenants.clear()
+        self._tenants_sync.clear()
+        self._retired.clear()
+
+
+# Process-wide client pool
+http_clients = HTTPClientPool.from_env()
@@ -0,0 +1,186 @@
+"""
+Persistent store for asynchronous extraction jobs
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+UNFINISHED = (QUEUED, RUNNING)
+FINISHED = (COMPLETED, FAILED)
+
+# Request fields only needed while the job runs, dropped once it finishes
+CREDENTIAL_FIELDS = ('supabase_key', 'cookies')
+
+# Job the current task is working for, so deep code can report progress
+current_job_id = contextvars.ContextVar('current_job_id', default=None)
+# Shared work (a coalesced extraction) the current task runs, whose progress
+# goes to every job waiting on it
+current_job_group = contextvars.ContextVar('current_job_group', default=None)
+
+
+class JobStore:
+    """
+    SQLite-backed job table. Jobs that were queued or running when the
+    process stopped are picked up again on the next start.
+    """
+
+    def __init__(self, path: str, retention: float = 7 * 24 * 3600):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._groups = {}  # group -> ids of the jobs waiting on it
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        # Scrubbed credentials are overwritten on disk, not just unlinked
+        self._db.execute('PRAGMA secure_delete=ON')
+        try:
+            os.chmod(path, 0o600)
+        except OSError:
+            pass
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY,'
+            ' status TEXT NOT NULL,'
+            ' stage TEXT,'
+            ' progress REAL NOT NULL DEFAULT 0,'
+            ' request TEXT NOT NULL,'
+            ' webhook_url TEXT,'
+            ' result TEXT,'
+            ' error TEXT,'
+            ' created_at REAL NOT NULL,'
+            ' updated_at REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)')
+
+    @classmethod
+    def from_env(cls) -> 'JobStore':
+        return cls(
+            path=os.getenv('JOB_STORE_PATH', os.path.join(tempfile.gettempdir(), 'blink-jobs.sqlite3')),
+            retention=float(os.getenv('JOB_RETENTION', 7 * 24 * 3600)),
+        )
+
+    def create(self, request: dict, webhook_url: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO jobs (id, status, stage, request, webhook_url, created_at, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, QUEUED, QUEUED, json.dumps(request), webhook_url, now, now)
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        if 'result' in fields and fields['result'] is not None:
+            fields['result'] = json.dumps(fields['result'])
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+            if fields.get('status') in FINISHED:
+                self._scrub('id = ?', (job_id,))
+
+    def _scrub(self, where: str, params: tuple):
+        """
+        Remove CREDENTIAL_FIELDS from the stored requests of matching jobs
+        """
+        paths = ', '.join(f"'$.{name}'" for name in CREDENTIAL_FIELDS)
+        self._db.execute(f'UPDATE jobs SET request = json_remove(request, {paths}) WHERE {where}', params)
+
+    @contextlib.contextmanager
+    def joined(self, group: str) -> Iterator[None]:
+        """
+        Attach the current job, if any, to ``group`` while it waits on that
+        shared work
+        """
+        job_id = current_job_id.get()
+        jobs = self._groups.setdefault(group, set())
+        if job_id:
+            jobs.add(job_id)
+        try:
+            yield
+        finally:
+            jobs.discard(job_id)
+            if not jobs and self._groups.get(group) is jobs:
+                del self._groups[group]
+
+    def report(self, stage: str, progress: float):
+        """
+        Record progress for the job the calling task runs for, or for every
+        job attached to the shared work it runs
+        """
+        group = current_job_group.get()
+        job_ids = list(self._groups.get(group, ())) if group else [current_job_id.get()]
+        for job_id in job_ids:
+            if job_id:
+                self.update(job_id, stage=stage, progress=progress)
+
+    def _to_dict(self, row: sqlite3.Row) -> dict:
+        return {
+            'job_id': row['id'],
+            'status': row['status'],
+            'stage': row['stage'],
+            'progress': row['progress'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def get_request(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute('SELECT request, webhook_url FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {'request': json.loads(row['request']), 'webhook_url': row['webhook_url']}
+
+    def unfinished(self) -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id FROM jobs WHERE status IN ({', '.join('?' for _ in UNFINISHED)}) ORDER BY created_at",
+                UNFINISHED
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def purge(self):
+        """
+        Drop finished jobs older than the retention period, and credentials
+        of finished jobs stored before they were scrubbed on completion
+        """
+        with self._lock:
+            self._db.execute(
+                'DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?',
+                (*FINISHED, time.time() - self.retention)
+            )
+            self._scrub('status IN (?, ?)', FINISHED)
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,11 +1,11 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import yt_dlp
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, model_validator
 import os
 import tempfile
-import requests
-from typing import Optional
+from typing import List, Literal, Optional
 import logging
 import random
 import time
@@ -13,6 +13,41 @@ import json
 import urllib.parse
 import re
 from bs4 import BeautifulSoup
+import asyncio
+import orjson
+import contextlib
+import dataclasses
+import itertools
+
+from workers import ExtractionExecutor, QueueFullError, parse_platform_limits
+from ydl_pool import YoutubeDLPool
+from tee_upload import is_progressive, tee_download_upload
+from http_client import http_clients
+from result_cache import ResultCache, credentials_fingerprint, result_cache_key
+from singleflight import SingleFlight
+from hedging import hedged_first
+from rate_limiter import CircuitOpenError, PlatformGuards
+from strategy_stats import StrategyStats
+from format_policy import (
+    MAX_DOWNLOAD_BYTES, FileTooLargeError, FormatPolicies, FormatPolicy, check_estimated_size, estimated_size,
+)
+from range_download import DOWNLOAD_ENGINE, RANGE_CONNECTIONS, RangeNotSupported, ranged_download, read_range
+from retry_policy import PERMANENT, STORAGE, RetryPolicy, classify_error
+from scratch import ScratchFullError, ScratchJob, ScratchManager, ScratchTooLargeError
+from thumbnails import ThumbnailRenderer, raw_content_type
+from postprocess import VideoProcessor, mp4_faststart
+from job_store import COMPLETED, FAILED, QUEUED, RUNNING, JobStore, current_job_group, current_job_id
+import url_normalizer
+from url_normalizer import VideoKey, resolve_video_key
+from storage import (
+    _storage_upload_request,
+    delete_object,
+    file_sha256,
+    object_exists,
+    promote_staged_upload,
+    run_uploads,
+    upload_content_addressed,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,7 +56,7 @@ logger = logging.getLogger(__name__)
 # ========== CUSTOM EXTRACTORS - NO COOKIES VERSION ==========
 # Public API endpoints - Zero risk for user accounts
 
-def tiktok_oembed_extract(url: str) -> dict:
+async def tiktok_oembed_extract(url: str) -> dict:
     """Extract TikTok video using oEmbed API (no cookies needed)"""
     try:
         # TikTok oEmbed endpoint
@@ -31,7 +66,7 @@ def tiktok_oembed_extract(url: str) -> dict:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
         
-        response = requests.get(oembed_url, headers=headers, timeout=10)
+        response = await http_clients.shared().get(oembed_url, headers=headers, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -56,7 +91,7 @@ def tiktok_oembed_extract(url: str) -> dict:
         logger.error(f"TikTok oEmbed error: {e}")
         return {"success": False, "error": str(e)}
 
-def tiktok_html_extract(url: str) -> dict:
+async def tiktok_html_extract(url: str) -> dict:
     """Extract TikTok video using HTML parsing"""
     try:
         headers = {
@@ -64,7 +99,7 @@ def tiktok_html_extract(url: str) -> dict:
             'Referer': 'https://www.tiktok.com/'
         }
         
-        response = requests.get(url, headers=headers, timeout=15)
+        response = await http_clients.shared().get(url, headers=headers, timeout=15)
         response.raise_for_status()
         
         # Extract video URL from script tags
@@ -97,7 +132,7 @@ def tiktok_html_extract(url: str) -> dict:
         logger.error(f"TikTok HTML extraction error: {e}")
         return {"success": False, "error": str(e)}
 
-def instagram_oembed_extract(url: str) -> dict:
+async def instagram_oembed_extract(url: str) -> dict:
     """Extract Instagram video using oEmbed API (no cookies needed)"""
     try:
         # Facebook oEmbed API for Instagram
@@ -107,7 +142,7 @@ def instagram_oembed_extract(url: str) -> dict:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
         
-        response = requests.get(oembed_url, headers=headers, timeout=10)
+        response = await http_clients.shared().get(oembed_url, headers=headers, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -131,7 +166,7 @@ def instagram_oembed_extract(url: str) -> dict:
         logger.error(f"Instagram oEmbed error: {e}")
         return {"success": False, "error": str(e)}
 
-def instagram_html_extract(url: str) -> dict:
+async def instagram_html_extract(url: str) -> dict:
     """Extract Instagram video using HTML parsing"""
     try:
         headers = {
@@ -141,7 +176,7 @@ def instagram_html_extract(url: str) -> dict:
             'Accept-Language': 'en-US,en;q=0.5',
         }
         
-        response = requests.get(url, headers=headers, timeout=15)
+        response = await http_clients.shared().get(url, headers=headers, timeout=15)
         response.raise_for_status()
         
         # Try to extract JSON data from script tags
@@ -190,33 +225,37 @@ def instagram_html_extract(url: str) -> dict:
         logger.error(f"Instagram HTML extraction error: {e}")
         return {"success": False, "error": str(e)}
 
-def custom_extract_video(url: str, platform: str) -> dict:
-    """Main custom extraction function - tries multiple methods without cookies"""
+# Custom extraction strategies per platform, in order of preference
+CUSTOM_STRATEGIES = {
+    'tiktok': [tiktok_oembed_extract, tiktok_html_extract],
+    'instagram': [instagram_oembed_extract, instagram_html_extract],
+}
+
+def _tracked_strategy(platform: str, strategy, url: str):
+    """Run a custom strategy, recording its outcome in the strategy stats"""
+    async def _run() -> dict:
+        started = time.monotonic()
+        result = await strategy(url)
+        strategy_stats.record(platform, strategy.__name__, result['success'], time.monotonic() - started)
+        return result
+    _run.__name__ = strategy.__name__
+    return _run
+
+async def custom_extract_video(url: str, platform: str) -> dict:
+    """Main custom extraction function - races multiple methods without cookies"""
     
     logger.info(f"Custom extraction: {platform} - {url}")
     
-    if platform == 'tiktok':
-        # Try oEmbed first
-        result = tiktok_oembed_extract(url)
-        if result['success']:
-            return result
-        
-        # Try HTML parsing as fallback
-        logger.info("TikTok oEmbed failed, trying HTML parsing...")
-        result = tiktok_html_extract(url)
-        if result['success']:
-            return result
-    
-    elif platform == 'instagram':
-        # Try oEmbed first
-        result = instagram_oembed_extract(url)
-        if result['success']:
-            return result
-        
-        # Try HTML parsing as fallback
-        logger.info("Instagram oEmbed failed, trying HTML parsing...")
-        result = instagram_html_extract(url)
-        if result['success']:
+    strategies = {strategy.__name__: strategy for strategy in CUSTOM_STRATEGIES.get(platform, [])}
+    if strategies:
+        # Start the methods staggered by HEDGE_DELAY, best-performing first;
+        # the first success wins and the slower ones are cancelled
+        ordered = strategy_stats.order(platform, list(strategies))
+        result = await hedged_first(
+            [_tracked_strategy(platform, strategies[name], url) for name in ordered],
+            is_success=lambda r: r['success']
+        )
+        if result and result['success']:
             return result
     
     return {
@@ -243,20 +282,22 @@ def create_success_response(result: dict, video_path: str, thumbnail_path: str)
         "extraction_method": result.get('method', 'unknown')
     }
 
+def custom_extraction_response(result: dict) -> 'ExtractionResponse':
+    """Response for a successful custom extraction (nothing stored)"""
+    logger.info(f"Custom extraction succeeded using {result.get('method', 'unknown')} method")
+    return ExtractionResponse(
+        success=True,
+        video_path=None,  # Custom extractors return video_url, not file path
+        thumbnail_path=None,
+        metadata=create_success_response(result, None, None)['metadata'],
+        error=None
+    )
+
 # ========== END CUSTOM EXTRACTORS ==========
 
 def detect_platform(url: str) -> str:
     """Detect platform from URL"""
-    if 'tiktok.com' in url.lower():
-        return 'tiktok'
-    elif 'instagram.com' in url.lower():
-        return 'instagram'
-    elif 'facebook.com' in url.lower() or 'fb.com' in url.lower():
-        return 'facebook'
-    elif 'twitter.com' in url.lower() or 'x.com' in url.lower():
-        return 'x'
-    else:
-        return 'unknown'
+    return url_normalizer.detect_platform(url)
 
 def get_rotated_user_agent() -> str:
     """Get rotated user agent to avoid rate limiting"""
@@ -305,12 +346,26 @@ def get_tiktok_cookies() -> dict:
         'a_bp': '50',
     }
 
-def get_enhanced_yt_dlp_options(temp_dir: str, platform: str, cookies: Optional[dict] = None) -> dict:
+def get_default_cookies(platform: str) -> Optional[dict]:
+    """
+    Built-in cookies used when the request doesn't provide any
+    """
+    if platform == 'instagram':
+        return get_instagram_cookies()
+    elif platform == 'tiktok':
+        return get_tiktok_cookies()
+    return None
+
+# Video file name inside the job's scratch directory
+OUTPUT_TEMPLATE = 'video.%(ext)s'
+
+def get_enhanced_yt_dlp_options(temp_dir: str, platform: str, cookies: Optional[dict] = None,
+                                policy: Optional[FormatPolicy] = None) -> dict:
     """
     Get enhanced yt-dlp options with cookies support
     """
     user_agent = get_rotated_user_agent()
-    video_path = os.path.join(temp_dir, 'video.%(ext)s')
+    video_path = os.path.join(temp_dir, OUTPUT_TEMPLATE)
     
     # Base headers
     base_headers = {
@@ -344,7 +399,6 @@ def get_enhanced_yt_dlp_options(temp_dir: str, platform: str, cookies: Optional[
         })
     
     options = {
-        'format': 'best[ext=mp4]/best',
         'outtmpl': video_path,
         'quiet': False,
         'no_warnings': False,
@@ -354,21 +408,27 @@ def get_enhanced_yt_dlp_options(temp_dir: str, platform: str, cookies: Optional[
         'http_headers': base_headers,
         'writethumbnail': True,
         'writesubtitles': False,
-        'retries': 5,
-        'fragment_retries': 5,
-        'extractor_retries': 5,
+        'retries': retry_policy.inner_retries,
+        'fragment_retries': retry_policy.inner_retries,
+        'extractor_retries': retry_policy.inner_retries,
         'skip_unavailable_fragments': True,
         'extractaudio': False,
         'audioformat': 'mp3',
         'audioquality': '192',
-        'format': 'best[ext=mp4]/best',
-        'writedescription': True,
-        'writeinfojson': True,
         'writesubtitles': False,
         'writeautomaticsub': False,
         'subtitleslangs': ['en'],
     }
     
+    # Format, sort order and size limit from the platform/request policy
+    options.update((policy or format_policies.for_request(platform)).ydl_options())
+    
+    # Progressive files on these platforms' CDNs are fetched over several
+    # connections; this takes precedence over the tee upload
+    connections = RANGED_DOWNLOAD_PLATFORMS.get(platform, 1)
+    options[DOWNLOAD_ENGINE] = 'ranged' if connections > 1 else 'native'
+    options[RANGE_CONNECTIONS] = connections
+    
     # Add cookies if provided
     if cookies:
         # Convert cookies dict to string format for yt-dlp
@@ -398,20 +458,132 @@ def get_enhanced_yt_dlp_options(temp_dir: str, platform: str, cookies: Optional[
     
     return options
 
+# Format keys kept in the response; URLs, headers and fragments are dropped
+FORMAT_SUMMARY_KEYS = ('format_id', 'ext', 'width', 'height', 'fps', 'vcodec', 'acodec', 'tbr', 'filesize')
+
+class QualityOptions(BaseModel):
+    max_height: Optional[int] = None
+    max_bitrate: Optional[int] = None  # kbps
+    max_filesize: Optional[int] = None  # bytes
+    codec: Optional[str] = None
+
+def _require_storage(request: BaseModel) -> BaseModel:
+    """
+    Supabase credentials are only needed when something gets uploaded
+    """
+    if request.mode == 'full' and not (request.supabase_url and request.supabase_key):
+        raise ValueError("supabase_url and supabase_key are required unless mode is 'metadata'")
+    return request
+
 class ExtractionRequest(BaseModel):
     url: str
-    supabase_url: str
-    supabase_key: str
+    supabase_url: Optional[str] = None  # required in 'full' mode
+    supabase_key: Optional[str] = None
     cookies: Optional[dict] = None  # Add cookies support
+    mode: Literal['full', 'metadata'] = 'full'  # 'metadata': no download or upload
+    fields: Optional[List[str]] = None  # Metadata keys to return (default: all)
+    quality: Optional[QualityOptions] = None  # Overrides the platform's format policy
+    
+    @model_validator(mode='after')
+    def _check_storage(self):
+        return _require_storage(self)
+
+class BatchExtractionRequest(BaseModel):
+    urls: List[str]
+    supabase_url: Optional[str] = None
+    supabase_key: Optional[str] = None
+    cookies: Optional[dict] = None
+    mode: Literal['full', 'metadata'] = 'full'
+    fields: Optional[List[str]] = None
+    quality: Optional[QualityOptions] = None
+    
+    @model_validator(mode='after')
+    def _check_storage(self):
+        return _require_storage(self)
+
+class JobRequest(ExtractionRequest):
+    webhook_url: Optional[str] = None  # POSTed the final job state when done
 
-class ExtractionResponse(BaseModel):
+@dataclasses.dataclass(slots=True)
+class ExtractionResponse:
+    """
+    Plain slotted dataclass rather than a Pydantic model: responses are built
+    by our own code, so they skip validation and go straight to orjson
+    """
     success: bool
     video_path: Optional[str] = None
     thumbnail_path: Optional[str] = None
-    metadata: dict = {}
+    metadata: dict = dataclasses.field(default_factory=dict)
     error: Optional[str] = None
+    cached: bool = False
+
+    def to_dict(self) -> dict:
+        return {
+            'success': self.success,
+            'video_path': self.video_path,
+            'thumbnail_path': self.thumbnail_path,
+            'metadata': self.metadata,
+            'error': self.error,
+            'cached': self.cached,
+        }
+
+app = FastAPI(title="Blink Enhanced Video Extraction Service with Cookies", default_response_class=ORJSONResponse)
+
+# Worker pool for blocking yt-dlp and upload work
+executor = ExtractionExecutor.from_env()
+
+# Reusable YoutubeDL instances, one idle set per platform
+ydl_pool = YoutubeDLPool.from_env()
+
+# Finished extractions by tenant and canonical video ID
+result_cache = ResultCache.from_env()
+
+# Metadata-only results; shared across tenants since nothing is stored
+metadata_cache = ResultCache.from_env('METADATA_CACHE', 'blink-metadata-cache.sqlite3', default_ttl=3600)
 
-app = FastAPI(title="Blink Enhanced Video Extraction Service with Cookies")
+# In-flight extractions, shared by concurrent requests for the same video
+extraction_flights = SingleFlight()
+
+# Asynchronous jobs (POST /jobs), persisted so they survive restarts
+job_store = JobStore.from_env()
+job_tasks = set()
+JOB_RETRY_DELAY = float(os.getenv('JOB_RETRY_DELAY', 5))
+WEBHOOK_ATTEMPTS = int(os.getenv('WEBHOOK_ATTEMPTS', 3))
+
+# POST /extract/batch limits
+BATCH_MAX_URLS = int(os.getenv('BATCH_MAX_URLS', 500))
+BATCH_PLATFORM_LIMITS = parse_platform_limits(os.getenv('BATCH_PLATFORM_LIMITS'))
+
+# Default and per-platform format policies (FORMAT_* env vars)
+format_policies = FormatPolicies.from_env()
+
+# Error-classified retry budgets for yt-dlp attempts
+retry_policy = RetryPolicy.from_env()
+
+# Live success rates of yt-dlp and the custom extractors, per platform
+strategy_stats = StrategyStats.from_env()
+YTDLP_METHOD = 'yt-dlp'
+
+# Per-platform request rate (adapts to 429/403) and circuit breaker
+platform_guards = PlatformGuards.from_env()
+
+# Platforms whose progressive downloads are uploaded while downloading
+TEE_UPLOAD_PLATFORMS = [p.strip() for p in os.getenv('TEE_UPLOAD_PLATFORMS', 'tiktok,instagram,facebook,x').split(',') if p.strip()]
+
+# Byte-range connections per download for the ranged engine; 1 uses yt-dlp's downloader.
+# Off by default: a ranged download is uploaded only after it finishes, so on a
+# platform in TEE_UPLOAD_PLATFORMS it trades the overlapped upload for faster
+# downloads. Worth it only where the CDN throttles each connection hard.
+RANGED_DOWNLOAD_PLATFORMS = parse_platform_limits(os.getenv('RANGED_DOWNLOAD_PLATFORMS'), defaults={})
+
+# Per-job download directories: tmpfs for small videos, disk for the rest, within quotas
+scratch = ScratchManager.from_env()
+
+# Resized WebP/JPEG thumbnail renditions, rendered in a process pool
+thumbnail_renderer = ThumbnailRenderer.from_env()
+
+# ffmpeg fast-start remux (and optional transcode) before videos are uploaded
+video_processor = VideoProcessor.from_env()
 
 # CORS middleware
 app.add_middleware(
@@ -422,6 +594,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Streamed NDJSON would sit in the gzip buffer instead of reaching the client
+UNCOMPRESSED_PATHS = {'/extract/batch'}
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZip responses, except streams whose lines must reach the client right away"""
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] in UNCOMPRESSED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv('GZIP_MIN_SIZE', 1000)),
+    compresslevel=int(os.getenv('GZIP_LEVEL', 5)),
+)
+
 @app.get("/")
 async def root():
     return {
@@ -430,158 +619,610 @@ async def root():
         "features": ["cookies_support", "enhanced_headers", "platform_specific_yt_dlp_options"]
     }
 
+def _warm_ydl_pool():
+    for platform in ['tiktok', 'instagram', 'facebook', 'x']:
+        options = get_enhanced_yt_dlp_options(tempfile.gettempdir(), platform, get_default_cookies(platform))
+        ydl_pool.warm(platform, options)
+    logger.info(f"YoutubeDL pool warmed: {ydl_pool.stats()}")
+
+@app.on_event("startup")
+async def start_thumbnail_pool():
+    # Forked first, while the process has no worker threads yet
+    thumbnail_renderer.start()
+
+@app.on_event("startup")
+async def warm_ydl_pool():
+    await executor.run_blocking(_warm_ydl_pool)
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    # Unfinished jobs stay queued/running in the store and resume on restart
+    for task in list(job_tasks):
+        task.cancel()
+    executor.shutdown()
+    ydl_pool.close()
+    await http_clients.aclose()
+    result_cache.close()
+    metadata_cache.close()
+    job_store.close()
+    thumbnail_renderer.shutdown()
+
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "enhanced": True}
+    return {
+        "status": "healthy",
+        "enhanced": True,
+        "workers": executor.stats(),
+        "ydl_pool": ydl_pool.stats(),
+        "http": http_clients.stats(),
+        "result_cache": result_cache.stats(),
+        "metadata_cache": metadata_cache.stats(),
+        "in_flight": extraction_flights.stats(),
+        "jobs": job_store.stats(),
+        "platforms": platform_guards.stats(),
+        "scratch": scratch.stats(),
+        "thumbnails": thumbnail_renderer.stats(),
+        "postprocess": video_processor.stats(),
+    }
+
+@app.get("/strategies")
+async def strategies():
+    """Rolling success rate and latency per platform and extraction method, the current
+    custom extractor order, and the platforms where yt-dlp is failing (custom extractors run first)"""
+    return {
+        "stats": strategy_stats.stats(),
+        "order": {
+            platform: strategy_stats.order(platform, [s.__name__ for s in methods])
+            for platform, methods in CUSTOM_STRATEGIES.items()
+        },
+        "ytdlp_failing": [
+            platform for platform in CUSTOM_STRATEGIES if strategy_stats.failing(platform, YTDLP_METHOD)
+        ],
+    }
+
+def video_metadata(info: dict, platform: str, url: str) -> dict:
+    """
+    Metadata we return for a video, from a yt-dlp info dict
+    """
+    return {
+        'title': info.get('title', 'Video'),
+        'description': info.get('description', ''),
+        'author': info.get('uploader', '') or info.get('channel', ''),
+        'duration': info.get('duration', 0),
+        'platform': info.get('extractor_key', platform).lower(),
+        'thumbnail_url': info.get('thumbnail', ''),
+        'upload_date': info.get('upload_date', ''),
+        'view_count': info.get('view_count', 0),
+        'like_count': info.get('like_count', 0),
+        'comment_count': info.get('comment_count', 0),
+        'formats': summarize_formats(info.get('formats') or []),
+        'url': info.get('webpage_url', url),
+    }
+
+def summarize_formats(formats: List[dict]) -> List[dict]:
+    """
+    Formats without URLs, headers and fragments: just what tells them apart
+    """
+    summary = []
+    for fmt in formats:
+        item = {key: fmt.get(key) for key in FORMAT_SUMMARY_KEYS if fmt.get(key) is not None}
+        filesize = fmt.get('filesize') or fmt.get('filesize_approx')
+        if filesize:
+            item['filesize'] = filesize
+        summary.append(item)
+    return summary
+
+def shape_metadata(metadata: dict, fields: Optional[List[str]] = None) -> dict:
+    """
+    Compact formats (results cached before they were summarized included
+    the full list) and keep only the requested ``fields``
+    """
+    shaped = metadata
+    formats = metadata.get('formats')
+    if formats and any(set(fmt) - set(FORMAT_SUMMARY_KEYS) for fmt in formats):
+        shaped = {**metadata, 'formats': summarize_formats(formats)}
+    if fields:
+        shaped = {key: shaped[key] for key in fields if key in shaped}
+    return shaped
+
+def _extract_info_with_yt_dlp(url: str, ydl_opts: dict, platform: str) -> dict:
+    """
+    Blocking metadata-only yt-dlp run: resolve the page, download nothing
+    """
+    with ydl_pool.checkout(platform, ydl_opts, url) as ydl:
+        return ydl.extract_info(url, download=False)
+
+def _remote_needs_remux(ydl, info: dict) -> bool:
+    """
+    Whether the fast-start remux will rewrite this video, judged from the box
+    headers at the start of the remote file (a few tiny range requests)
+    """
+    if not video_processor.remuxing or (info.get('ext') or 'mp4') != 'mp4':
+        return False
+    try:
+        return mp4_faststart(lambda offset, size: read_range(ydl, info, offset, offset + size - 1)) is False
+    except Exception as e:
+        logger.info(f"Couldn't check the MP4 layout before downloading: {e}")
+        return False
+
+def _download_with_yt_dlp(url: str, scratch_job: ScratchJob, ydl_opts: dict, platform: str,
+                          tee_target: Optional[dict] = None):
+    """
+    Blocking yt-dlp run for one attempt - called from the worker pool.
+    
+    Once the format is known, ``scratch_job`` reserves room for it and picks
+    the directory (tmpfs or disk) the files are written to.
+    
+    Progressive formats use the ranged engine when the platform's options
+    select it, otherwise with ``tee_target`` (upload url + headers) they are
+    uploaded while they download; the returned TeeResult says whether that
+    happened. Everything else, and any ranged failure, goes through yt-dlp.
+    """
+    tee_result = None
+    with ydl_pool.checkout(platform, ydl_opts, url) as ydl:
+        # Resolve the page and format list once...
+        info = ydl.extract_info(url, download=False)
+        logger.info(f"Video info extracted: {info.get('title', 'Unknown')}")
+        
+        # Don't start a download the format policy already rules out
+        max_bytes = ydl_opts.get(MAX_DOWNLOAD_BYTES)
+        check_estimated_size(info, max_bytes)
+        
+        # Reserve scratch space for the expected size, waiting if quotas are used up;
+        # post-processing briefly needs room for a second copy
+        temp_dir = scratch_job.place(estimated_size(info), copies=2 if video_processor.enabled else 1)
+        ydl.params['outtmpl']['default'] = os.path.join(temp_dir, OUTPUT_TEMPLATE)
+        
+        ranged = ydl_opts.get(DOWNLOAD_ENGINE) == 'ranged' and is_progressive(info)
+        streamed = bool(tee_target) and is_progressive(info)
+        if streamed and _remote_needs_remux(ydl, info):
+            # The remuxed file would replace the streamed upload: upload once, after the remux
+            logger.info("Video index is at the end of the file, uploading after the fast-start remux")
+            streamed = False
+        native = True
+        video_file = None
+        if ranged or streamed:
+            # Let yt-dlp write only the sidecar files (thumbnail etc.)...
+            ydl.params['skip_download'] = True
+            try:
+                info = ydl.process_ie_result(info, download=True)
+            finally:
+                ydl.params['skip_download'] = False
+            video_path = os.path.join(temp_dir, f"video.{info.get('ext') or 'mp4'}")
+            
+            if ranged:
+                # ...and fetch byte ranges over several connections...
+                try:
+                    ranged_download(ydl, info, video_path, platform, ydl_opts[RANGE_CONNECTIONS], max_bytes)
+                    native = False
+                    video_file = video_path
+                except FileTooLargeError:
+                    raise
+                except RangeNotSupported as e:
+                    logger.info(f"Not using ranged download: {e}")
+                except Exception as e:
+                    logger.warning(f"Ranged download failed, falling back to yt-dlp: {e}")
+                    if os.path.exists(video_path):
+                        os.remove(video_path)
+            
+            if native and streamed:
+                # ...or stream the video to disk and storage at the same time
+                tee_result = tee_download_upload(ydl, info, video_path, max_bytes=max_bytes, **tee_target)
+                native = False
+                video_file = video_path
+        
+        if native:
+            # ...then download straight from the resolved info dict
+            info = ydl.process_ie_result(info, download=True)
+            downloads = info.get('requested_downloads') or []
+            video_file = downloads[0].get('filepath') if downloads else None
+    
+    # yt-dlp records where it wrote each file; no need to scan the directory
+    thumbnail_file = next(
+        (t['filepath'] for t in reversed(info.get('thumbnails') or []) if t.get('filepath')), None
+    )
+    
+    if not video_file or not os.path.isfile(video_file):
+        raise Exception("Video file not found after download")
+    logger.info(f"Downloaded video: {video_file} ({os.path.getsize(video_file)} bytes)")
+    if thumbnail_file and not os.path.isfile(thumbnail_file):
+        thumbnail_file = None
+    
+    return info, video_file, thumbnail_file, tee_result
 
 @app.post("/extract", response_model=ExtractionResponse)
 async def extract_video(request: ExtractionRequest):
     """
     Extract video from social media URL using enhanced yt-dlp with cookies support
     """
+    # Returning the response directly skips FastAPI's response_model
+    # validation and re-serialization; the model only documents the schema
+    response = await extract(request)
+    return ORJSONResponse(response.to_dict())
+
+async def extract(request: ExtractionRequest) -> ExtractionResponse:
+    """
+    /extract without the HTTP layer, for jobs and batches
+    """
+    response = await _extract_video(request)
+    
+    # Responses can be shared between coalesced requests: copy, don't mutate
+    metadata = shape_metadata(response.metadata, request.fields)
+    if metadata is not response.metadata:
+        response = dataclasses.replace(response, metadata=metadata)
+    return response
+
+async def _extract_video(request: ExtractionRequest) -> ExtractionResponse:
+    logger.info(f"Extracting video from: {request.url}")
+    
+    # Resolve short links and tracking params to a canonical (platform, video_id)
+    video_key = await resolve_video_key(request.url)
+    
+    if video_key is None:
+        return ExtractionResponse(
+            success=False,
+            error=f"Unsupported URL. Please use TikTok, Instagram, Facebook, or X URLs."
+        )
+    
+    platform = video_key.platform
+    logger.info(f"Detected platform: {platform} (video {video_key.video_id})")
+    
+    if request.mode == 'metadata':
+        return await _extract_metadata(video_key, request.cookies)
+    
+    # Serve already-ingested videos straight from the result cache
+    cache_key = result_cache_key(request.supabase_url, platform, video_key.video_id)
+    if request.quality:
+        # A non-default rendition is a different result
+        cache_key += f"|{_format_policy(request, platform).cache_suffix()}"
+    cached_result = result_cache.get(cache_key)
+    # Only for callers whose key can read the stored object (which also
+    # catches objects deleted from the bucket since)
+    if cached_result and await object_exists(
+            cached_result['video_path'], request.supabase_url, request.supabase_key):
+        logger.info(f"Result cache hit: {cache_key}")
+        # The timings were the original run's, not this request's
+        metadata = {k: v for k, v in (cached_result['metadata'] or {}).items() if k != 'timings'}
+        return ExtractionResponse(success=True, cached=True, **{**cached_result, 'metadata': metadata})
+    if cached_result:
+        logger.info(f"Result cache entry not readable with this key, extracting again: {cache_key}")
+    
+    # Extract from the canonical URL (short link already followed, tracking params dropped)
+    request = request.model_copy(update={'url': video_key.url})
+    
+    # Concurrent requests for the same video share a single extraction, but only
+    # between callers with the same credentials: the flight uploads with them
+    flight_key = f"{cache_key}|{credentials_fingerprint(request.supabase_key, request.cookies)}"
+    # Every job sharing the flight sees its progress
+    with job_store.joined(flight_key):
+        return await extraction_flights.do(flight_key, _run_extraction, request, platform, cache_key, flight_key)
+
+def _format_policy(request: ExtractionRequest, platform: str) -> FormatPolicy:
+    overrides = request.quality.model_dump() if request.quality else None
+    return format_policies.for_request(platform, overrides)
+
+async def _extract_metadata(video_key: VideoKey, cookies: Optional[dict]) -> ExtractionResponse:
+    """
+    Title, author, duration, thumbnail and counts without downloading anything
+    """
+    cache_key = f"{video_key.platform}:{video_key.video_id}"
+    if cookies:
+        # What a logged-in session sees is that session's alone
+        cache_key += f"|{credentials_fingerprint(cookies)}"
+    cached_metadata = metadata_cache.get(cache_key)
+    if cached_metadata:
+        logger.info(f"Metadata cache hit: {cache_key}")
+        return ExtractionResponse(success=True, cached=True, metadata=cached_metadata)
+    return await extraction_flights.do(f"metadata|{cache_key}", _run_metadata_extraction, video_key, cookies, cache_key)
+
+async def _run_metadata_extraction(video_key: VideoKey, cookies: Optional[dict], cache_key: str) -> ExtractionResponse:
+    platform = video_key.platform
+    guard = platform_guards[platform]
+    probe = False
     try:
-        logger.info(f"Extracting video from: {request.url}")
+        if not guard.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {platform}, skipping yt-dlp")
+        probe = guard.breaker.probing
+        await guard.bucket.acquire()
         
-        # Detect platform
-        platform = detect_platform(request.url)
-        logger.info(f"Detected platform: {platform}")
+        # No temp directory: nothing is written with download=False
+        ydl_opts = get_enhanced_yt_dlp_options(tempfile.gettempdir(), platform, cookies or get_default_cookies(platform))
+        async with executor.slot(platform):
+            info = await executor.run_blocking(_extract_info_with_yt_dlp, video_key.url, ydl_opts, platform)
+        guard.record_success()
+        probe = False
         
-        if platform == 'unknown':
-            return ExtractionResponse(
-                success=False,
-                error=f"Unsupported URL. Please use TikTok, Instagram, Facebook, or X URLs."
-            )
+        metadata = video_metadata(info, platform, video_key.url)
+        metadata_cache.set(cache_key, metadata)
+        return ExtractionResponse(success=True, metadata=metadata)
+    
+    except QueueFullError as e:
+        logger.warning(f"Rejecting metadata extraction: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    except Exception as e:
+        logger.warning(f"Metadata extraction failed: {str(e)}")
+        if not isinstance(e, CircuitOpenError):
+            guard.record_error(str(e))
+            probe = False
+        if classify_error(e) == PERMANENT:
+            return ExtractionResponse(success=False, error=str(e))
         
+        # oEmbed/HTML gives title, author and thumbnail for link previews
+        custom_result = await custom_extract_video(video_key.url, platform)
+        if custom_result['success']:
+            return custom_extraction_response(custom_result)
+        return ExtractionResponse(success=False, error=str(e))
+    
+    finally:
+        # Rejected or cancelled before yt-dlp told us anything: let the next call probe
+        if probe:
+            guard.breaker.release_probe()
+
+async def _run_extraction(request: ExtractionRequest, platform: str, cache_key: str,
+                          flight_key: str) -> ExtractionResponse:
+    """
+    Download, upload and cache one video, falling back to the custom extractors
+    """
+    # The flight runs in its own task: progress goes to the jobs joined to it
+    current_job_group.set(flight_key)
+    # Only while yt-dlp keeps failing on this platform, try the custom
+    # extractors first; now and then yt-dlp still goes first so its stats
+    # show when it recovers
+    custom_tried = False
+    if (platform in CUSTOM_STRATEGIES and strategy_stats.failing(platform, YTDLP_METHOD)
+            and random.random() >= strategy_stats.explore):
+        logger.info(f"yt-dlp is failing for {platform}, trying custom extractors first")
+        custom_tried = True
+        job_store.report('custom', 0.05)
+        custom_result = await custom_extract_video(request.url, platform)
+        if custom_result['success']:
+            return custom_extraction_response(custom_result)
+    
+    try:
         # Get platform-specific cookies if none provided
-        platform_cookies = None
-        if not request.cookies:
-            if platform == 'instagram':
-                platform_cookies = get_instagram_cookies()
-            elif platform == 'tiktok':
-                platform_cookies = get_tiktok_cookies()
-        else:
-            platform_cookies = request.cookies
+        platform_cookies = request.cookies or get_default_cookies(platform)
         
-        # Create temporary directory for downloads
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Get enhanced options with cookies
-            ydl_opts = get_enhanced_yt_dlp_options(temp_dir, platform, platform_cookies)
-            
-            # Try extraction with enhanced retry logic
-            max_attempts = 5 if platform in ['instagram', 'tiktok'] else 3
-            for attempt in range(max_attempts):
-                try:
-                    logger.info(f"Attempt {attempt + 1}: Extracting video info...")
-                    
-                    # Add delay between attempts to avoid rate limiting
-                    if attempt > 0:
-                        if platform in ['instagram', 'tiktok']:
-                            time.sleep(random.uniform(3, 7))  # Randomized delay for better stealth
-                        else:
-                            time.sleep(random.uniform(1, 3))
-                    
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        # Extract info without downloading first
-                        info = ydl.extract_info(request.url, download=False)
-                        logger.info(f"Video info extracted: {info.get('title', 'Unknown')}")
+        # Wait for a worker slot, rejecting the job if the queue is full
+        async with executor.slot(platform):
+            # Scratch directory for downloads, placed once the size is known
+            with scratch.job() as scratch_job:
+                # Get enhanced options with cookies; the output directory is set per attempt
+                ydl_opts = get_enhanced_yt_dlp_options(
+                    tempfile.gettempdir(), platform, platform_cookies, _format_policy(request, platform)
+                )
+                
+                # Retry only what can succeed, within the request's retry budget
+                guard = platform_guards[platform]
+                budget = retry_policy.budget()
+                ytdlp_started = time.monotonic()
+                for attempt in itertools.count(1):
+                    probe = False
+                    downloaded = False
+                    try:
+                        logger.info(f"Attempt {attempt}: Extracting video info...")
                         
-                        # Now download the video
-                        with yt_dlp.YoutubeDL(ydl_opts) as ydl_download:
-                            ydl_download.download([request.url])
+                        # Platform is blocking us: go straight to the fallback
+                        if not guard.breaker.allow():
+                            raise CircuitOpenError(f"Circuit open for {platform}, skipping yt-dlp")
+                        probe = guard.breaker.probing
+                        await guard.bucket.acquire()
                         
-                        # Find downloaded files
-                        video_file = None
-                        thumbnail_file = None
-                        json_file = None
+                        # Streamed uploads go to a staging name until the content hash is known
+                        staged_filename = f"staging/video_{platform}_{os.urandom(8).hex()}.mp4"
+                        tee_target = None
+                        # A transcoded file replaces every streamed upload, so don't stream
+                        if platform in TEE_UPLOAD_PLATFORMS and not video_processor.transcoding:
+                            upload_url, upload_headers = _storage_upload_request(
+                                staged_filename, "video/mp4", request.supabase_url, request.supabase_key
+                            )
+                            tee_target = {'upload_url': upload_url, 'headers': upload_headers}
                         
-                        for file in os.listdir(temp_dir):
-                            file_path = os.path.join(temp_dir, file)
-                            if file.endswith(('.mp4', '.webm', '.mkv')) and os.path.isfile(file_path):
-                                video_file = file_path
-                                logger.info(f"Found video file: {file} ({os.path.getsize(file_path)} bytes)")
-                            elif file.endswith(('.jpg', '.jpeg', '.png', '.webp')) and os.path.isfile(file_path):
-                                thumbnail_file = file_path
-                                logger.info(f"Found thumbnail: {file} ({os.path.getsize(file_path)} bytes)")
-                            elif file.endswith('.info.json'):
-                                json_file = file_path
-                                logger.info(f"Found info JSON: {file}")
+                        job_store.report('downloading', 0.1)
+                        download_started = time.monotonic()
+                        # The tenant client stays leased (not closed on eviction) until the thread is done
+                        tee_lease = (http_clients.tenant_sync(request.supabase_url) if tee_target
+                                     else contextlib.nullcontext())
+                        with tee_lease as tee_client:
+                            if tee_target:
+                                tee_target['client'] = tee_client
+                            info, video_file, thumbnail_file, tee_result = await executor.run_blocking(
+                                _download_with_yt_dlp, request.url, scratch_job, ydl_opts, platform, tee_target
+                            )
+                        timings = {'download': round((time.monotonic() - download_started) * 1000)}
+                        guard.record_success()
+                        probe = False
+                        downloaded = True
+                        strategy_stats.record(platform, YTDLP_METHOD, True, time.monotonic() - ytdlp_started)
                         
-                        if not video_file:
-                            raise Exception("Video file not found after download")
+                        # Fast-start remux / transcode before the video is uploaded
+                        job_store.report('processing', 0.5)
+                        postprocess_started = time.monotonic()
+                        processed_file = await video_processor.process(video_file, info)
+                        if processed_file:
+                            timings['postprocess'] = round((time.monotonic() - postprocess_started) * 1000)
+                            video_file = processed_file
+                            if tee_result and tee_result.uploaded:
+                                # The streamed copy is the unprocessed file (its layout
+                                # couldn't be checked before the download)
+                                await delete_object(staged_filename, request.supabase_url, request.supabase_key)
+                            tee_result = None
                         
                         # Get enhanced metadata
-                        metadata = {
-                            'title': info.get('title', 'Video'),
-                            'description': info.get('description', ''),
-                            'author': info.get('uploader', '') or info.get('channel', ''),
-                            'duration': info.get('duration', 0),
-                            'platform': info.get('extractor_key', platform).lower(),
-                            'thumbnail_url': info.get('thumbnail', ''),
-                            'upload_date': info.get('upload_date', ''),
-                            'view_count': info.get('view_count', 0),
-                            'like_count': info.get('like_count', 0),
-                            'comment_count': info.get('comment_count', 0),
-                            'formats': info.get('formats', []),
-                            'url': info.get('webpage_url', request.url),
-                        }
+                        metadata = video_metadata(info, platform, request.url)
                         
                         logger.info(f"Enhanced metadata extracted for {platform}")
                         
-                        # Upload video to Supabase Storage
-                        logger.info("Uploading video to Supabase Storage...")
-                        video_storage_path = await upload_to_supabase(
-                            video_file,
-                            f"video_{platform}_{os.urandom(8).hex()}.mp4",
-                            "video/mp4",
-                            request.supabase_url,
-                            request.supabase_key
-                        )
-                        
-                        # Upload thumbnail if available
-                        thumbnail_storage_path = None
-                        if thumbnail_file:
-                            logger.info("Uploading thumbnail to Supabase Storage...")
-                            thumbnail_storage_path = await upload_to_supabase(
-                                thumbnail_file,
-                                f"thumb_{platform}_{os.urandom(8).hex()}.jpg",
-                                "image/jpeg",
+                        # Store video under its content hash: already-stored bytes
+                        # are not uploaded again
+                        async def _upload_video() -> str:
+                            if tee_result and tee_result.uploaded:
+                                return await promote_staged_upload(
+                                    staged_filename,
+                                    tee_result.sha256,
+                                    "video",
+                                    "mp4",
+                                    request.supabase_url,
+                                    request.supabase_key
+                                )
+                            logger.info("Uploading video to Supabase Storage...")
+                            video_sha256 = tee_result.sha256 if tee_result else await executor.run_blocking(file_sha256, video_file)
+                            return await upload_content_addressed(
+                                video_file,
+                                video_sha256,
+                                "video",
+                                "mp4",
+                                "video/mp4",
                                 request.supabase_url,
                                 request.supabase_key
                             )
                         
+                        async def _upload_thumbnail():
+                            # Resized renditions when they can be rendered, otherwise
+                            # the original under its real type
+                            renditions = []
+                            if thumbnail_renderer.enabled:
+                                try:
+                                    renditions = await thumbnail_renderer.render(thumbnail_file)
+                                except Exception as e:
+                                    logger.warning(f"Thumbnail renditions failed, uploading the original: {e}")
+                            
+                            logger.info("Uploading thumbnail to Supabase Storage...")
+                            if not renditions:
+                                ext, content_type = raw_content_type(thumbnail_file)
+                                return await upload_content_addressed(
+                                    thumbnail_file,
+                                    await executor.run_blocking(file_sha256, thumbnail_file),
+                                    "thumb",
+                                    ext,
+                                    content_type,
+                                    request.supabase_url,
+                                    request.supabase_key
+                                ), []
+                            
+                            paths, _ = await run_uploads({
+                                rendition.file_path: upload_content_addressed(
+                                    rendition.file_path,
+                                    rendition.sha256,
+                                    "thumb",
+                                    rendition.ext,
+                                    rendition.content_type,
+                                    request.supabase_url,
+                                    request.supabase_key
+                                )
+                                for rendition in renditions
+                            })
+                            uploaded = [
+                                {'path': paths[r.file_path], 'width': r.width, 'height': r.height, 'format': r.format}
+                                for r in renditions if not isinstance(paths[r.file_path], BaseException)
+                            ]
+                            if not uploaded:
+                                raise next(iter(paths.values()))
+                            # thumbnail_path stays a JPEG for existing clients: the largest one
+                            primary = max(uploaded, key=lambda r: (r['format'] == 'jpeg', r['width']))
+                            return primary['path'], uploaded
+                        
+                        # Video and thumbnail (if available) upload concurrently
+                        job_store.report('uploading', 0.6)
+                        uploads = {'video': _upload_video()}
+                        if thumbnail_file:
+                            uploads['thumbnail'] = _upload_thumbnail()
+                        upload_results, upload_timings = await run_uploads(uploads)
+                        timings.update({f"upload_{name}": ms for name, ms in upload_timings.items()})
+                        
+                        # Without the video the attempt failed; a missing thumbnail is tolerated
+                        video_storage_path = upload_results['video']
+                        if isinstance(video_storage_path, BaseException):
+                            raise video_storage_path
+                        thumbnail_storage_path, thumbnails = None, []
+                        thumbnail_result = upload_results.get('thumbnail')
+                        if isinstance(thumbnail_result, BaseException):
+                            logger.warning(f"Thumbnail upload failed, continuing without it: {thumbnail_result}")
+                        elif thumbnail_result:
+                            thumbnail_storage_path, thumbnails = thumbnail_result
+                        if thumbnails:
+                            metadata['thumbnails'] = thumbnails
+                        
+                        timings['total'] = round((time.monotonic() - download_started) * 1000)
+                        metadata['timings'] = timings
+                        
                         logger.info(f"Upload complete - video: {video_storage_path}, thumbnail: {thumbnail_storage_path}")
                         
+                        result = {
+                            'video_path': video_storage_path,
+                            'thumbnail_path': thumbnail_storage_path,
+                            'metadata': metadata,
+                        }
+                        result_cache.set(cache_key, result)
+                        if info.get('id'):
+                            # Also remember the ID yt-dlp resolved, in case the URL had none
+                            info_key = result_cache_key(request.supabase_url, platform, str(info['id']))
+                            if request.quality:
+                                info_key += f"|{_format_policy(request, platform).cache_suffix()}"
+                            if info_key != cache_key:
+                                result_cache.set(info_key, result)
+                        
                         return ExtractionResponse(
                             success=True,
                             video_path=video_storage_path,
                             thumbnail_path=thumbnail_storage_path,
                             metadata=metadata
                         )
-                        
-                except Exception as e:
-                    logger.warning(f"Attempt {attempt + 1} failed: {str(e)}")
-                    if attempt == max_attempts - 1:  # Last attempt
+                            
+                    except (CircuitOpenError, ScratchFullError, ScratchTooLargeError):
                         raise
-                    else:
-                        continue
+                    except Exception as e:
+                        # Don't hold scratch space through the backoff
+                        scratch_job.release()
+                        error_class = classify_error(e)
+                        logger.warning(f"Attempt {attempt} failed ({error_class}): {str(e)}")
+                        # Only the yt-dlp step talks to the platform: a storage error
+                        # after the download must not throttle or trip the platform
+                        if not downloaded:
+                            guard.record_error(str(e))
+                            probe = False
+                        delay = budget.next_delay(error_class)
+                        if delay is None:
+                            # A missing or private video, or a failed upload, says nothing about yt-dlp
+                            if error_class != PERMANENT and not downloaded:
+                                strategy_stats.record(platform, YTDLP_METHOD, False, time.monotonic() - ytdlp_started)
+                            raise
+                        await asyncio.sleep(delay)
+                    finally:
+                        # Out of scratch space, cancelled, ...: yt-dlp told us nothing,
+                        # so let the next call probe
+                        if probe:
+                            guard.breaker.release_probe()
+    
+    except QueueFullError as e:
+        logger.warning(f"Rejecting extraction: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    except ScratchTooLargeError as e:
+        # Final, unlike a full queue: jobs and batches must not retry it
+        logger.warning(f"Rejecting extraction: {str(e)}")
+        raise HTTPException(status_code=507, detail=str(e))
                 
     except Exception as e:
         logger.error(f"Extraction failed after all attempts: {str(e)}")
         
+        # Private, deleted or unsupported: the custom extractors won't find it
+        # either; a failed upload isn't theirs to fix; and if they already ran
+        # first there's no point repeating them
+        if classify_error(e) in (PERMANENT, STORAGE) or custom_tried:
+            return ExtractionResponse(
+                success=False,
+                error=str(e)
+            )
+        
         # FALLBACK: Try custom extractors without cookies
         logger.info(f"Cookies extraction failed, trying custom extractors for {platform}...")
         
         try:
-            custom_result = custom_extract_video(request.url, platform)
+            job_store.report('fallback', 0.8)
+            custom_result = await custom_extract_video(request.url, platform)
             if custom_result['success']:
-                logger.info(f"Custom extraction succeeded using {custom_result.get('method', 'unknown')} method")
-                return ExtractionResponse(
-                    success=True,
-                    video_path=None,  # Custom extractors return video_url, not file path
-                    thumbnail_path=None,
-                    metadata=create_success_response(custom_result, None, None)['metadata'],
-                    error=None
-                )
+                return custom_extraction_response(custom_result)
             else:
                 logger.warning(f"Custom extraction also failed: {custom_result.get('error', 'Unknown error')}")
         except Exception as custom_error:
@@ -593,6 +1234,145 @@ async def extract_video(request: ExtractionRequest):
             error=str(e)
         )
 
+async def _extract_when_admitted(request: ExtractionRequest) -> ExtractionResponse:
+    """
+    extract_video for already-queued work (jobs, batches): wait for
+    capacity instead of failing when the extraction queue is full
+    """
+    while True:
+        try:
+            return await extract(request)
+        except HTTPException as e:
+            if e.status_code != 503:
+                raise
+            job_store.report('waiting_for_worker', 0.0)
+            await asyncio.sleep(JOB_RETRY_DELAY)
+
+async def _notify_webhook(webhook_url: str, job: dict):
+    """
+    POST the final job state to the client's webhook, with a few retries
+    """
+    for attempt in range(WEBHOOK_ATTEMPTS):
+        try:
+            response = await http_clients.shared().post(webhook_url, json=job, timeout=10)
+            if response.status_code < 400:
+                return
+            logger.warning(f"Webhook {webhook_url} returned {response.status_code}")
+        except Exception as e:
+            logger.warning(f"Webhook {webhook_url} failed: {e}")
+        await asyncio.sleep(2 ** attempt)
+    logger.error(f"Giving up on webhook for job {job['job_id']}")
+
+async def _run_job(job_id: str):
+    """
+    Run a stored job through the regular extraction path and record the outcome
+    """
+    stored = job_store.get_request(job_id)
+    if stored is None:
+        return
+    token = current_job_id.set(job_id)
+    try:
+        # Parsed inside the try so a bad stored request still finishes the job (and drops its credentials)
+        request = ExtractionRequest(**stored['request'])
+        job_store.update(job_id, status=RUNNING, stage='starting', progress=0.0)
+        response = await _extract_when_admitted(request)
+        
+        status = COMPLETED if response.success else FAILED
+        job_store.update(job_id, status=status, stage=status, progress=1.0,
+                         result=response.to_dict(), error=response.error)
+    except Exception as e:
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"Job {job_id} failed: {error}")
+        job_store.update(job_id, status=FAILED, stage=FAILED, error=error)
+    finally:
+        current_job_id.reset(token)
+    
+    if stored['webhook_url']:
+        await _notify_webhook(stored['webhook_url'], job_store.get(job_id))
+
+def _start_job(job_id: str):
+    task = asyncio.create_task(_run_job(job_id))
+    job_tasks.add(task)
+    task.add_done_callback(job_tasks.discard)
+
+@app.on_event("startup")
+async def resume_jobs():
+    job_store.purge()
+    unfinished = job_store.unfinished()
+    if unfinished:
+        logger.info(f"Resuming {len(unfinished)} unfinished jobs")
+    for job_id in unfinished:
+        _start_job(job_id)
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: JobRequest):
+    """
+    Queue an extraction and return its job ID right away
+    """
+    job_id = job_store.create(request.model_dump(exclude={'webhook_url'}), request.webhook_url)
+    _start_job(job_id)
+    return {"job_id": job_id, "status": QUEUED}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status, progress and (once finished) result of a job
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/extract/batch")
+async def extract_batch(request: BatchExtractionRequest):
+    """
+    Extract many URLs, streaming one NDJSON line per URL as soon as it finishes
+    """
+    if len(request.urls) > BATCH_MAX_URLS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_URLS} URLs per batch")
+    
+    # Group by platform so each platform gets its own concurrency limit
+    by_platform = {}
+    for index, url in enumerate(request.urls):
+        by_platform.setdefault(detect_platform(url), []).append((index, url))
+    logger.info(f"Batch of {len(request.urls)} URLs: { {p: len(items) for p, items in by_platform.items()} }")
+    
+    semaphores = {platform: asyncio.Semaphore(BATCH_PLATFORM_LIMITS.get(platform, 4)) for platform in by_platform}
+    
+    async def _extract_one(index: int, url: str, platform: str) -> dict:
+        async with semaphores[platform]:
+            try:
+                response = await _extract_when_admitted(ExtractionRequest(
+                    url=url,
+                    supabase_url=request.supabase_url,
+                    supabase_key=request.supabase_key,
+                    cookies=request.cookies,
+                    mode=request.mode,
+                    fields=request.fields,
+                    quality=request.quality,
+                ))
+                result = response.to_dict()
+            except Exception as e:
+                error = e.detail if isinstance(e, HTTPException) else str(e)
+                result = ExtractionResponse(success=False, error=error).to_dict()
+        return {'index': index, 'url': url, **result}
+    
+    async def _results():
+        tasks = [
+            asyncio.create_task(_extract_one(index, url, platform))
+            for platform, items in by_platform.items()
+            for index, url in items
+        ]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield orjson.dumps(await finished) + b"\n"
+        finally:
+            # Client went away or we're done: don't leave work running
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(_results(), media_type="application/x-ndjson")
+
 @app.post("/test-cookies")
 async def test_cookies():
     """
@@ -604,34 +1384,6 @@ async def test_cookies():
         "user_agents": [get_rotated_user_agent() for _ in range(3)]
     }
 
-async def upload_to_supabase(file_path: str, storage_filename: str, content_type: str, supabase_url: str, supabase_key: str) -> str:
-    """
-    Upload file to Supabase Storage bucket
-    """
-    try:
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-        
-        upload_url = f"{supabase_url}/storage/v1/object/blink-videos/{storage_filename}"
-        
-        headers = {
-            'Authorization': f'Bearer {supabase_key}',
-            'Content-Type': content_type,
-            'x-upsert': 'true'
-        }
-        
-        response = requests.post(upload_url, headers=headers, data=file_data)
-        
-        if response.status_code not in [200, 201]:
-            raise Exception(f"Upload failed: {response.status_code} - {response.text}")
-        
-        logger.info(f"Uploaded {storage_filename} ({len(file_data)} bytes)")
-        return storage_filename
-        
-    except Exception as e:
-        logger.error(f"Upload error: {str(e)}")
-        raise
-
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
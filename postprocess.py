@@ -0,0 +1,199 @@
+"""
+ffmpeg post-processing of downloaded videos: fast-start remux and optional
+transcoding, in a bounded pool of subprocesses
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import struct
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FASTSTART = 'faststart'
+TRANSCODE = 'transcode'
+
+# moov/mdat come within the first few top-level boxes (ftyp, free, ...)
+MAX_LEADING_BOXES = 16
+
+
+def mp4_faststart(read_at: Callable[[int, int], bytes]) -> Optional[bool]:
+    """
+    Whether the MP4's ``moov`` atom comes before ``mdat``, from the top-level
+    box headers; ``read_at(offset, size)`` returns up to ``size`` bytes at
+    ``offset``. None when the file isn't an MP4 we can walk.
+    """
+    offset = 0
+    for _ in range(MAX_LEADING_BOXES):
+        header = read_at(offset, 16)
+        if len(header) < 8:
+            return None
+        size, box_type = struct.unpack('>I4s', header[:8])
+        if box_type == b'moov':
+            return True
+        if box_type == b'mdat':
+            return False
+        if size == 1:
+            if len(header) < 16:
+                return None
+            size = struct.unpack('>Q', header[8:16])[0]
+        if size < 8:  # 0 (runs to the end of the file) or corrupt
+            return None
+        offset += size
+    return None
+
+
+def is_faststart(file_path: str) -> Optional[bool]:
+    """
+    mp4_faststart for a local file
+    """
+    with open(file_path, 'rb') as f:
+        def _read_at(offset: int, size: int) -> bytes:
+            f.seek(offset)
+            return f.read(size)
+        return mp4_faststart(_read_at)
+
+
+class VideoProcessor:
+    """
+    Rewrites downloads so playback can start before the whole file arrives:
+    MP4s with the index at the end are remuxed with ``+faststart`` (no
+    re-encode), and with a transcode target videos above it are re-encoded
+    to H.264 at that height/bitrate. At most ``max_workers`` ffmpeg processes
+    run at once, each limited to ``threads`` threads at ``nice`` priority.
+    """
+
+    def __init__(self, ffmpeg: Optional[str], faststart: bool = True, max_height: Optional[int] = None,
+                 bitrate: Optional[int] = None, preset: str = 'veryfast', max_workers: int = 2,
+                 threads: int = 1, nice: int = 10, timeout: float = 120.0):
+        self.ffmpeg = ffmpeg
+        self.faststart = faststart
+        self.max_height = max_height
+        self.bitrate = bitrate  # video kbps
+        self.preset = preset
+        self.max_workers = max_workers
+        self.threads = threads
+        self.nice = nice
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_workers)
+        self._counts = {'remuxed': 0, 'transcoded': 0, 'skipped': 0, 'failed': 0}
+
+    @classmethod
+    def from_env(cls) -> 'VideoProcessor':
+        ffmpeg = shutil.which(os.getenv('FFMPEG_PATH', 'ffmpeg'))
+        if not ffmpeg:
+            logger.warning("ffmpeg not found, video post-processing disabled")
+        return cls(
+            ffmpeg,
+            faststart=os.getenv('VIDEO_FASTSTART', 'true').lower() in ('1', 'true', 'yes'),
+            max_height=int(os.getenv('VIDEO_TRANSCODE_MAX_HEIGHT', 0)) or None,
+            bitrate=int(os.getenv('VIDEO_TRANSCODE_BITRATE', 0)) or None,
+            preset=os.getenv('VIDEO_TRANSCODE_PRESET', 'veryfast'),
+            max_workers=int(os.getenv('FFMPEG_WORKERS', 2)),
+            threads=int(os.getenv('FFMPEG_THREADS', 1)),
+            nice=int(os.getenv('FFMPEG_NICE', 10)),
+            timeout=float(os.getenv('FFMPEG_TIMEOUT', 120)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.ffmpeg) and (self.faststart or self.transcoding)
+
+    @property
+    def remuxing(self) -> bool:
+        return bool(self.ffmpeg) and self.faststart
+
+    @property
+    def transcoding(self) -> bool:
+        return bool(self.ffmpeg) and bool(self.max_height or self.bitrate)
+
+    def _needs_transcode(self, info: dict) -> bool:
+        if not self.transcoding:
+            return False
+        height = info.get('height')
+        bitrate = info.get('vbr') or info.get('tbr')
+        # Unknown dimensions/bitrate: re-encode, the target is a ceiling anyway
+        return bool(
+            (self.max_height and (not height or height > self.max_height))
+            or (self.bitrate and (not bitrate or bitrate > self.bitrate))
+            or (info.get('vcodec') or 'h264').split('.')[0] not in ('h264', 'avc1')
+        )
+
+    def _command(self, source: str, target: str, transcode: bool) -> List[str]:
+        command = [self.ffmpeg, '-nostdin', '-v', 'error', '-y', '-i', source, '-map', '0:v:0?', '-map', '0:a:0?']
+        if transcode:
+            command += ['-c:v', 'libx264', '-preset', self.preset, '-pix_fmt', 'yuv420p']
+            if self.max_height:
+                command += ['-vf', f'scale=-2:min(ih\\,{self.max_height})']
+            if self.bitrate:
+                command += ['-b:v', f'{self.bitrate}k', '-maxrate', f'{self.bitrate}k',
+                            '-bufsize', f'{self.bitrate * 2}k']
+            command += ['-c:a', 'aac', '-b:a', '128k']
+        else:
+            command += ['-c', 'copy']
+        command += ['-threads', str(self.threads), '-filter_threads', str(self.threads),
+                    '-movflags', '+faststart', target]
+        if self.nice and shutil.which('nice'):
+            command = ['nice', '-n', str(self.nice)] + command
+        return command
+
+    async def process(self, file_path: str, info: dict) -> Optional[str]:
+        """
+        Path of the processed copy of ``file_path``, or None when the file is
+        fine as it is or ffmpeg failed (the original is used then)
+        """
+        if not self.enabled:
+            return None
+        transcode = self._needs_transcode(info)
+        if not transcode:
+            faststart = is_faststart(file_path) if self.faststart else True
+            if faststart is not False:
+                self._counts['skipped'] += 1
+                return None
+
+        action = TRANSCODE if transcode else FASTSTART
+        target = f"{os.path.splitext(file_path)[0]}_{action}.mp4"
+        async with self._slots:
+            process = await asyncio.create_subprocess_exec(
+                *self._command(file_path, target, transcode),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+            except BaseException as e:
+                # Timed out, or the request was cancelled: don't leave ffmpeg running
+                process.kill()
+                await process.wait()
+                if os.path.exists(target):
+                    os.remove(target)
+                if not isinstance(e, asyncio.TimeoutError):
+                    raise
+                self._counts['failed'] += 1
+                logger.warning(f"ffmpeg {action} of {file_path} timed out")
+                return None
+
+        if process.returncode != 0:
+            if os.path.exists(target):
+                os.remove(target)
+            self._counts['failed'] += 1
+            logger.warning(f"ffmpeg {action} failed ({process.returncode}): {stderr.decode(errors='replace')[-500:]}")
+            return None
+
+        self._counts['transcoded' if transcode else 'remuxed'] += 1
+        logger.info(f"ffmpeg {action}: {os.path.getsize(file_path)} -> {os.path.getsize(target)} bytes")
+        # Only one copy needs to stay in scratch space
+        os.remove(file_path)
+        return target
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'faststart': self.faststart,
+            'transcode': {'max_height': self.max_height, 'bitrate': self.bitrate} if self.transcoding else None,
+            'workers': self.max_workers,
+            'threads': self.threads,
+            **self._counts,
+        }
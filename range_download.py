@@ -0,0 +1,174 @@
+"""
+Parallel range-split downloads for progressive media files
+"""
+
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from yt_dlp.networking import Request
+
+from format_policy import check_downloaded_size
+from workers import parse_platform_limits
+
+logger = logging.getLogger(__name__)
+
+# Our own YoutubeDL params, set per platform in get_enhanced_yt_dlp_options
+DOWNLOAD_ENGINE = 'download_engine'  # 'ranged' or 'native'
+RANGE_CONNECTIONS = 'range_connections'
+
+READ_SIZE = 256 * 1024
+MIN_SPLIT_SIZE = int(os.getenv('RANGED_MIN_SPLIT_SIZE', 2 * 1024 * 1024))
+
+CONTENT_RANGE_RE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+)')
+
+_segment_pool = ThreadPoolExecutor(max_workers=int(os.getenv('RANGED_WORKERS', 32)), thread_name_prefix='range')
+
+
+class RangeNotSupported(Exception):
+    """The server doesn't serve byte ranges (or the file is too small to split)"""
+
+
+class _PlatformConnections:
+    """
+    Caps concurrent range connections per platform across all downloads, so
+    we don't trade per-connection throttling for per-IP throttling
+    """
+
+    def __init__(self, limits: Dict[str, int], default_limit: int):
+        self.limits = limits
+        self.default_limit = default_limit
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, platform: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(platform)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.limits.get(platform, self.default_limit))
+                self._semaphores[platform] = semaphore
+            return semaphore
+
+
+platform_connections = _PlatformConnections(
+    parse_platform_limits(os.getenv('RANGED_PLATFORM_CONNECTIONS'), defaults={}),
+    int(os.getenv('RANGED_DEFAULT_PLATFORM_CONNECTIONS', 16)),
+)
+
+
+def _open(ydl, info: dict, start: int, end: int):
+    headers = dict(info.get('http_headers') or {})
+    headers['Range'] = f'bytes={start}-{end}'
+    return ydl.urlopen(Request(info['url'], headers=headers))
+
+
+def probe_length(ydl, info: dict) -> int:
+    """
+    Total size of ``info['url']`` from a one-byte range request; raises
+    RangeNotSupported when the server ignores ranges
+    """
+    response = _open(ydl, info, 0, 0)
+    try:
+        match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range') or '')
+        if response.status != 206 or not match:
+            raise RangeNotSupported(f"No byte range support (HTTP {response.status})")
+        return int(match.group(3))
+    finally:
+        response.close()
+
+
+def read_range(ydl, info: dict, start: int, end: int) -> bytes:
+    """
+    Bytes start..end of ``info['url']``; raises RangeNotSupported when the
+    server doesn't answer with that range
+    """
+    response = _open(ydl, info, start, end)
+    try:
+        if response.status != 206:
+            raise RangeNotSupported(f"No byte range support (HTTP {response.status})")
+        return response.read(end - start + 1)
+    finally:
+        response.close()
+
+
+def split_ranges(total: int, parts: int) -> List[Tuple[int, int]]:
+    """
+    ``parts`` contiguous inclusive (start, end) ranges covering ``total`` bytes
+    """
+    size = -(-total // parts)
+    return [(start, min(start + size, total) - 1) for start in range(0, total, size)]
+
+
+def _fetch_segment(ydl, info: dict, fd: int, start: int, end: int, platform: str, failed: threading.Event) -> int:
+    """
+    Download bytes start..end straight into their place in the file
+    """
+    with platform_connections[platform]:
+        if failed.is_set():
+            return 0
+        response = _open(ydl, info, start, end)
+        try:
+            match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range') or '')
+            if response.status != 206 or not match or int(match.group(1)) != start:
+                raise RangeNotSupported(f"Bad range response for {start}-{end} (HTTP {response.status})")
+
+            offset = start
+            while offset <= end and not failed.is_set():
+                chunk = response.read(min(READ_SIZE, end - offset + 1))
+                if not chunk:
+                    break
+                os.pwrite(fd, chunk, offset)
+                offset += len(chunk)
+        finally:
+            response.close()
+
+    if offset != end + 1 and not failed.is_set():
+        raise IOError(f"Range {start}-{end} ended early at {offset}")
+    return offset - start
+
+
+def ranged_download(ydl, info: dict, file_path: str, platform: str, connections: int,
+                    max_bytes: Optional[int] = None) -> int:
+    """
+    Download a progressive format over ``connections`` concurrent byte-range
+    requests into a preallocated file. Returns the file size.
+
+    RangeNotSupported is raised before anything is written when ranges can't
+    be used; any other error leaves a partial file the caller should discard.
+    """
+    total = probe_length(ydl, info)
+    check_downloaded_size(total, max_bytes)
+    if total < MIN_SPLIT_SIZE:
+        raise RangeNotSupported(f"File too small to split ({total} bytes)")
+
+    ranges = split_ranges(total, connections)
+    failed = threading.Event()
+    fd = os.open(file_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # Reserve the whole file up front; segments are written in place
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, total)
+        else:
+            os.ftruncate(fd, total)
+
+        futures = [
+            _segment_pool.submit(_fetch_segment, ydl, info, fd, start, end, platform, failed)
+            for start, end in ranges
+        ]
+        try:
+            size = sum(future.result() for future in futures)
+        except BaseException:
+            # Stop the other segments and let them finish before the fd closes
+            failed.set()
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            raise
+    finally:
+        os.close(fd)
+
+    logger.info(f"Ranged download finished: {size} bytes over {len(ranges)} connections")
+    return size
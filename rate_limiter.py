@@ -0,0 +1,204 @@
+"""
+Per-platform adaptive rate limiting and circuit breaking
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_RE = re.compile(r'\b(?:429|403)\b|too many requests|rate.?limit|forbidden', re.IGNORECASE)
+
+
+def is_throttle_error(message: str) -> bool:
+    """
+    True for errors that mean the platform is pushing back on us
+    """
+    return bool(THROTTLE_RE.search(message or ''))
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket whose rate halves on every throttling response and creeps
+    back up by ``increase`` tokens/s per success (AIMD)
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate: float = 0.05, increase: float = 0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.increase = increase
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttled(self):
+        self.rate = max(self.min_rate, self.rate / 2)
+        logger.warning(f"Throttled, rate lowered to {self.rate:.2f}/s")
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures. While open all
+    calls are rejected; after ``reset_timeout`` one probe is let through
+    (half-open) and its outcome closes or re-opens the breaker. A caller
+    that got the probe must record an outcome or ``release_probe``; a probe
+    nobody settled expires after another ``reset_timeout``.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and self._probe_in_flight and now - self._probe_started >= self.reset_timeout:
+            logger.warning("Half-open probe was never settled, letting another one through")
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            self._probe_started = now
+            return True
+        return False
+
+    @property
+    def probing(self) -> bool:
+        """
+        Half-open with the probe handed out: right after ``allow()`` returned
+        True, this means the caller holds the probe
+        """
+        return self.state == self.HALF_OPEN and self._probe_in_flight
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self):
+        """
+        The probe ended without telling us anything; let the next call probe
+        """
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit opened after {self.failures} failures")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+def parse_platform_rates(raw: Optional[str]) -> Dict[str, float]:
+    """
+    Parse "platform=requests_per_second,..." into a dict
+    """
+    rates = {}
+    for item in (raw or '').split(','):
+        if '=' not in item:
+            continue
+        platform, value = item.split('=', 1)
+        try:
+            rates[platform.strip().lower()] = float(value)
+        except ValueError:
+            logger.warning(f"Ignoring invalid platform rate: {item}")
+    return rates
+
+
+class PlatformGuard:
+    """
+    Rate limiter and circuit breaker for one platform
+    """
+
+    def __init__(self, rate: float, burst: float, failure_threshold: int, reset_timeout: float):
+        self.bucket = AdaptiveTokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+    def record_success(self):
+        self.bucket.on_success()
+        self.breaker.record_success()
+
+    def record_error(self, message: str):
+        if is_throttle_error(message):
+            self.bucket.on_throttled()
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_probe()
+
+    def stats(self) -> dict:
+        return {
+            'rate': round(self.bucket.rate, 3),
+            'breaker': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+        }
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a platform whose circuit is open"""
+
+
+class PlatformGuards:
+    def __init__(self, rates: Dict[str, float], default_rate: float, burst: float,
+                 failure_threshold: int, reset_timeout: float):
+        self.rates = rates
+        self.default_rate = default_rate
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._guards: Dict[str, PlatformGuard] = {}
+
+    @classmethod
+    def from_env(cls) -> 'PlatformGuards':
+        return cls(
+            rates=parse_platform_rates(os.getenv('PLATFORM_RATE_LIMITS')),
+            default_rate=float(os.getenv('PLATFORM_DEFAULT_RATE', 2)),
+            burst=float(os.getenv('PLATFORM_RATE_BURST', 5)),
+            failure_threshold=int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5)),
+            reset_timeout=float(os.getenv('BREAKER_RESET_TIMEOUT', 60)),
+        )
+
+    def __getitem__(self, platform: str) -> PlatformGuard:
+        guard = self._guards.get(platform)
+        if guard is None:
+            guard = PlatformGuard(self.rates.get(platform, self.default_rate), self.burst,
+                                  self.failure_threshold, self.reset_timeout)
+            self._guards[platform] = guard
+        return guard
+
+    def stats(self) -> dict:
+        return {platform: guard.stats() for platform, guard in self._guards.items()}
@@ -0,0 +1,138 @@
+"""
+Cache of finished extractions: in-memory LRU in front of a SQLite store
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def result_cache_key(tenant: str, platform: str, video_id: str) -> str:
+    """
+    Results are stored per Supabase project, since paths point into its bucket
+    """
+    return f"{tenant.rstrip('/')}|{platform}:{video_id}"
+
+
+def credentials_fingerprint(*credentials) -> str:
+    """
+    Short digest telling callers with different credentials apart in keys,
+    without putting the secrets themselves in the key
+    """
+    encoded = json.dumps(credentials, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    Maps a canonical video key to the stored video/thumbnail paths and metadata.
+
+    Lookups hit the in-memory LRU first and fall back to SQLite, so results
+    survive restarts. Entries expire after ``ttl`` seconds and the store is
+    trimmed to ``max_entries`` rows, least recently used first.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600,
+                 memory_entries: int = 1024, max_entries: int = 100000):
+        self.path = path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)')
+
+    @classmethod
+    def from_env(cls, prefix: str = 'RESULT_CACHE', filename: str = 'blink-result-cache.sqlite3',
+                 default_ttl: float = 7 * 24 * 3600) -> 'ResultCache':
+        return cls(
+            path=os.getenv(f'{prefix}_PATH', os.path.join(tempfile.gettempdir(), filename)),
+            ttl=float(os.getenv(f'{prefix}_TTL', default_ttl)),
+            memory_entries=int(os.getenv(f'{prefix}_MEMORY_ENTRIES', 1024)),
+            max_entries=int(os.getenv(f'{prefix}_MAX_ENTRIES', 100000)),
+        )
+
+    def _remember(self, key: str, created_at: float, value: dict):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._db.execute(
+                    'SELECT value, created_at FROM results WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[1], json.loads(row[0]))
+                    self._remember(key, *entry)
+
+            if entry is None or now - entry[0] > self.ttl:
+                if entry is not None:
+                    self._delete(key)
+                self.misses += 1
+                return None
+
+            self._memory.move_to_end(key)
+            self._db.execute('UPDATE results SET accessed_at = ? WHERE key = ?', (now, key))
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: dict):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._db.execute(
+                'INSERT OR REPLACE INTO results (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now, now)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(now)
+
+    def _delete(self, key: str):
+        self._memory.pop(key, None)
+        self._db.execute('DELETE FROM results WHERE key = ?', (key,))
+
+    def _evict(self, now: float):
+        self._db.execute('DELETE FROM results WHERE created_at < ?', (now - self.ttl,))
+        self._db.execute(
+            'DELETE FROM results WHERE key IN ('
+            ' SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+            return {'memory': len(self._memory), 'stored': rows, 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,138 @@
+"""
+Error classification and per-request retry budgets for extraction attempts
+"""
+
+import logging
+import os
+import random
+import re
+import time
+from typing import Optional
+
+from rate_limiter import is_throttle_error
+from storage import StorageError
+
+logger = logging.getLogger(__name__)
+
+PERMANENT = 'permanent'
+RATE_LIMITED = 'rate_limited'
+TRANSIENT = 'transient'
+STORAGE = 'storage'  # our own upload failed; says nothing about the platform
+
+# Messages that won't change no matter how often we retry
+PERMANENT_RE = re.compile(
+    r'unsupported url'
+    r'|private (?:video|account|post)|(?:video|account|post|content) is private|this (?:video|post|account) is private'
+    r'|(?:has been|was) (?:removed|deleted)|no longer available|does not exist|doesn\'t exist'
+    r'|(?:video|content|post|media|tweet) (?:is )?(?:not |un)available|isn\'t available|page not found'
+    r'|no video (?:could be found|formats found)|there\'s no video'
+    r'|not available in your country|geo.?restrict|copyright'
+    r'|exceeds max_filesize'
+    r'|\b(?:404|410|451)\b',
+    re.IGNORECASE,
+)
+
+PERMANENT_STATUSES = {404, 410, 451}
+RATE_LIMITED_STATUSES = {403, 429}
+
+
+def _http_status(error: BaseException) -> Optional[int]:
+    """
+    HTTP status behind a yt-dlp/httpx error, following wrapped causes
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        status = getattr(error, 'status', None) or getattr(error, 'code', None)
+        response = getattr(error, 'response', None)
+        if status is None and response is not None:
+            status = getattr(response, 'status_code', None) or getattr(response, 'status', None)
+        if isinstance(status, int):
+            return status
+        exc_info = getattr(error, 'exc_info', None)  # yt-dlp DownloadError
+        error = getattr(error, 'cause', None) or (exc_info[1] if exc_info else None) or error.__cause__
+    return None
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    PERMANENT, RATE_LIMITED, TRANSIENT or STORAGE. Anything unrecognized is transient.
+    """
+    if isinstance(error, StorageError):
+        return STORAGE
+    status = _http_status(error)
+    if status in RATE_LIMITED_STATUSES:
+        return RATE_LIMITED
+    if status in PERMANENT_STATUSES:
+        return PERMANENT
+    message = str(error)
+    if is_throttle_error(message):
+        return RATE_LIMITED
+    if PERMANENT_RE.search(message):
+        return PERMANENT
+    return TRANSIENT
+
+
+class RetryBudget:
+    """
+    Retries left for one request. Each error class has its own budget and
+    all retries must fit before the request's deadline.
+    """
+
+    def __init__(self, policy: 'RetryPolicy'):
+        self.policy = policy
+        self.deadline = time.monotonic() + policy.deadline
+        self.used = {RATE_LIMITED: 0, TRANSIENT: 0, STORAGE: 0}
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def next_delay(self, error_class: str) -> Optional[float]:
+        """
+        Seconds to wait before retrying, or None when the request should give up
+        """
+        limit, base_delay = self.policy.budgets.get(error_class, (0, 0))
+        used = self.used.get(error_class, 0)
+        if used >= limit:
+            return None
+
+        # Exponential backoff with jitter
+        delay = base_delay * (2 ** used) * random.uniform(0.75, 1.25)
+        if delay >= self.remaining():
+            logger.info(f"Retry deadline reached, not retrying {error_class} error")
+            return None
+        self.used[error_class] = used + 1
+        return delay
+
+
+class RetryPolicy:
+    def __init__(self, rate_limited_retries: int = 2, rate_limited_delay: float = 4.0,
+                 transient_retries: int = 3, transient_delay: float = 1.0,
+                 storage_retries: int = 0, storage_delay: float = 1.0,
+                 deadline: float = 45.0, inner_retries: int = 2):
+        self.budgets = {
+            PERMANENT: (0, 0),
+            RATE_LIMITED: (rate_limited_retries, rate_limited_delay),
+            TRANSIENT: (transient_retries, transient_delay),
+            # A retry downloads the video again; a bad key or full bucket won't fix itself
+            STORAGE: (storage_retries, storage_delay),
+        }
+        self.deadline = deadline
+        # yt-dlp's own retries inside each attempt
+        self.inner_retries = inner_retries
+
+    @classmethod
+    def from_env(cls) -> 'RetryPolicy':
+        return cls(
+            rate_limited_retries=int(os.getenv('RETRY_RATE_LIMITED_ATTEMPTS', 2)),
+            rate_limited_delay=float(os.getenv('RETRY_RATE_LIMITED_DELAY', 4)),
+            transient_retries=int(os.getenv('RETRY_TRANSIENT_ATTEMPTS', 3)),
+            transient_delay=float(os.getenv('RETRY_TRANSIENT_DELAY', 1)),
+            storage_retries=int(os.getenv('RETRY_STORAGE_ATTEMPTS', 0)),
+            storage_delay=float(os.getenv('RETRY_STORAGE_DELAY', 1)),
+            deadline=float(os.getenv('RETRY_DEADLINE', 45)),
+            inner_retries=int(os.getenv('YTDLP_RETRIES', 2)),
+        )
+
+    def budget(self) -> RetryBudget:
+        return RetryBudget(self)
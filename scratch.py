@@ -0,0 +1,153 @@
+"""
+Scratch space for downloads: a RAM-backed tier for small jobs, disk for the
+rest, with per-tier quotas and per-job reservations
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+from workers import QueueFullError
+
+logger = logging.getLogger(__name__)
+
+# Room kept on top of the video estimate for the thumbnail and .part overhead
+SIDECAR_ALLOWANCE = 2 * 1024 * 1024
+
+
+class ScratchFullError(QueueFullError):
+    """No tier had room for the job within the wait timeout"""
+
+
+class ScratchTooLargeError(Exception):
+    """The job needs more space than any tier's quota: waiting won't help"""
+
+
+class ScratchTier:
+    def __init__(self, name: str, path: str, quota: int, max_job: Optional[int] = None):
+        self.name = name
+        self.path = path
+        self.quota = quota
+        self.max_job = max_job  # largest reservation this tier accepts
+        self.reserved = 0
+        self.jobs = 0
+
+    def accepts(self, size: int) -> bool:
+        return self.max_job is None or size <= self.max_job
+
+    def has_room(self, size: int) -> bool:
+        return self.reserved + size <= self.quota
+
+    def stats(self) -> dict:
+        return {'path': self.path, 'quota': self.quota, 'reserved': self.reserved, 'jobs': self.jobs}
+
+
+class ScratchJob:
+    """
+    Working directory of one extraction. ``place`` picks a tier and reserves
+    space once the expected size is known; ``release`` frees both.
+    """
+
+    def __init__(self, manager: 'ScratchManager'):
+        self.manager = manager
+        self.name = uuid.uuid4().hex
+        self.tier: Optional[ScratchTier] = None
+        self.size = 0
+        self.path: Optional[str] = None
+
+    def place(self, expected_size: Optional[int], copies: int = 1) -> str:
+        """
+        Reserve ``copies`` times ``expected_size`` bytes (the manager's default
+        when unknown), blocking while quotas are exhausted, and return an
+        empty directory to download into
+        """
+        self.release()
+        size = (expected_size or self.manager.default_reservation) * copies + SIDECAR_ALLOWANCE
+        self.tier, self.size = self.manager.reserve(size)
+        self.path = os.path.join(self.tier.path, f"blink-{self.name}")
+        os.makedirs(self.path, exist_ok=True)
+        return self.path
+
+    def release(self):
+        if self.path:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+        if self.tier:
+            self.manager.free(self.tier, self.size)
+            self.tier = None
+
+    def __enter__(self) -> 'ScratchJob':
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ScratchManager:
+    def __init__(self, tiers: List[ScratchTier], default_reservation: int = 64 * 1024 * 1024,
+                 wait_timeout: float = 30.0):
+        self.tiers = tiers
+        self.default_reservation = default_reservation
+        self.wait_timeout = wait_timeout
+        self._changed = threading.Condition()
+
+    @classmethod
+    def from_env(cls) -> 'ScratchManager':
+        tiers = []
+        ram_path = os.getenv('SCRATCH_RAM_PATH', '/dev/shm')
+        if ram_path and os.path.isdir(ram_path) and os.access(ram_path, os.W_OK):
+            # Never plan on more than half of the tmpfs (Docker gives 64 MB by default)
+            ram_quota = min(int(os.getenv('SCRATCH_RAM_QUOTA', 256 * 1024 * 1024)),
+                            shutil.disk_usage(ram_path).total // 2)
+            tiers.append(ScratchTier('ram', ram_path, ram_quota,
+                                     max_job=int(os.getenv('SCRATCH_RAM_MAX_JOB', 32 * 1024 * 1024))))
+        disk_path = os.getenv('SCRATCH_DISK_PATH', tempfile.gettempdir())
+        disk_quota = min(int(os.getenv('SCRATCH_DISK_QUOTA', 5 * 1024 * 1024 * 1024)),
+                         int(shutil.disk_usage(disk_path).free * 0.9))
+        tiers.append(ScratchTier('disk', disk_path, disk_quota))
+        return cls(
+            tiers,
+            default_reservation=int(os.getenv('SCRATCH_DEFAULT_RESERVATION', 64 * 1024 * 1024)),
+            wait_timeout=float(os.getenv('SCRATCH_WAIT_TIMEOUT', 30)),
+        )
+
+    def job(self) -> ScratchJob:
+        return ScratchJob(self)
+
+    def reserve(self, size: int):
+        """
+        (tier, size) for the first tier that accepts ``size`` and has room,
+        waiting up to ``wait_timeout`` for running jobs to free space
+        """
+        candidates = [tier for tier in self.tiers if tier.accepts(size)]
+        if not any(size <= tier.quota for tier in candidates):
+            raise ScratchTooLargeError(f"Job needs {size} bytes, more than any scratch quota")
+
+        deadline = time.monotonic() + self.wait_timeout
+        with self._changed:
+            while True:
+                for tier in candidates:
+                    if tier.has_room(size):
+                        tier.reserved += size
+                        tier.jobs += 1
+                        logger.info(f"Reserved {size} bytes of {tier.name} scratch")
+                        return tier, size
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ScratchFullError(f"No scratch space for {size} bytes")
+                self._changed.wait(remaining)
+
+    def free(self, tier: ScratchTier, size: int):
+        with self._changed:
+            tier.reserved -= size
+            tier.jobs -= 1
+            self._changed.notify_all()
+
+    def stats(self) -> dict:
+        with self._changed:
+            return {tier.name: tier.stats() for tier in self.tiers}
@@ -0,0 +1,59 @@
+"""
+Single-flight: concurrent calls for the same key share one in-flight task
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    The first caller for a key starts the work, later callers await the same
+    task and get the same result or exception.
+
+    A caller that is cancelled only stops waiting; the shared task keeps
+    running for the others and is cancelled once nobody waits for it. Work
+    it already handed to a worker thread runs to completion, and the task
+    holds its resources until then (see ExtractionExecutor.run_blocking).
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: str, func: Callable[..., Awaitable], *args, **kwargs):
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(func(*args, **kwargs)))
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            self._calls[key] = call
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.info(f"Joining in-flight extraction: {key}")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                logger.info(f"All callers gone, cancelling in-flight extraction: {key}")
+                call.task.cancel()
+
+    def stats(self) -> dict:
+        return {'in_flight': len(self._calls), 'started': self.started, 'coalesced': self.coalesced}
@@ -0,0 +1,193 @@
+"""
+Supabase Storage helpers: streaming uploads and content-addressed dedup
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Awaitable, Dict, Tuple
+
+from http_client import http_clients
+
+logger = logging.getLogger(__name__)
+
+BUCKET = 'blink-videos'
+UPLOAD_CHUNK_SIZE = 256 * 1024
+UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', 4))
+
+
+class StorageError(Exception):
+    """Supabase Storage rejected an upload or couldn't be reached"""
+
+
+def _auth_headers(supabase_key: str) -> dict:
+    return {'Authorization': f'Bearer {supabase_key}'}
+
+
+def _storage_upload_request(storage_filename: str, content_type: str, supabase_url: str, supabase_key: str):
+    """
+    Upload URL and headers for an object in the blink-videos bucket
+    """
+    upload_url = f"{supabase_url}/storage/v1/object/{BUCKET}/{storage_filename}"
+
+    headers = {
+        **_auth_headers(supabase_key),
+        'Content-Type': content_type,
+        'x-upsert': 'true'
+    }
+    return upload_url, headers
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    SHA-256 of a file, read in blocks - run it in the worker pool
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_addressed_name(prefix: str, sha256: str, ext: str) -> str:
+    """
+    Deterministic object name: identical bytes always map to the same object
+    """
+    return f"{prefix}_{sha256}.{ext}"
+
+
+async def upload_to_supabase(file_path: str, storage_filename: str, content_type: str, supabase_url: str, supabase_key: str) -> str:
+    """
+    Upload file to Supabase Storage bucket
+    """
+    try:
+        file_size = os.path.getsize(file_path)
+
+        upload_url, headers = _storage_upload_request(storage_filename, content_type, supabase_url, supabase_key)
+        headers['Content-Length'] = str(file_size)
+
+        async def _file_chunks():
+            # Stream the file from disk in small blocks instead of
+            # holding the whole video in memory; reads run off the event loop
+            loop = asyncio.get_running_loop()
+            with open(file_path, 'rb') as f:
+                while chunk := await loop.run_in_executor(None, f.read, UPLOAD_CHUNK_SIZE):
+                    yield chunk
+
+        with http_clients.tenant(supabase_url) as client:
+            response = await client.post(upload_url, headers=headers, content=_file_chunks(), timeout=None)
+
+        if response.status_code not in [200, 201]:
+            raise StorageError(f"Upload failed: {response.status_code} - {response.text}")
+
+        logger.info(f"Uploaded {storage_filename} ({file_size} bytes)")
+        return storage_filename
+
+    except StorageError as e:
+        logger.error(f"Upload error: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Upload error: {str(e)}")
+        raise StorageError(f"Upload failed: {e}") from e
+
+
+async def object_exists(storage_filename: str, supabase_url: str, supabase_key: str) -> bool:
+    """
+    HEAD the object; any failure counts as "not there" so we upload instead
+    """
+    url = f"{supabase_url}/storage/v1/object/authenticated/{BUCKET}/{storage_filename}"
+    try:
+        with http_clients.tenant(supabase_url) as client:
+            response = await client.head(url, headers=_auth_headers(supabase_key))
+        return response.status_code == 200
+    except Exception as e:
+        logger.warning(f"Existence check failed for {storage_filename}: {e}")
+        return False
+
+
+async def delete_object(storage_filename: str, supabase_url: str, supabase_key: str):
+    url = f"{supabase_url}/storage/v1/object/{BUCKET}/{storage_filename}"
+    try:
+        with http_clients.tenant(supabase_url) as client:
+            response = await client.delete(url, headers=_auth_headers(supabase_key))
+        if response.status_code not in [200, 204]:
+            logger.warning(f"Delete of {storage_filename} failed: {response.status_code}")
+    except Exception as e:
+        logger.warning(f"Delete of {storage_filename} failed: {e}")
+
+
+async def move_object(source: str, destination: str, supabase_url: str, supabase_key: str) -> bool:
+    url = f"{supabase_url}/storage/v1/object/move"
+    with http_clients.tenant(supabase_url) as client:
+        response = await client.post(
+            url,
+            headers=_auth_headers(supabase_key),
+            json={'bucketId': BUCKET, 'sourceKey': source, 'destinationKey': destination},
+        )
+    return response.status_code == 200
+
+
+async def upload_content_addressed(file_path: str, sha256: str, prefix: str, ext: str, content_type: str,
+                                   supabase_url: str, supabase_key: str) -> str:
+    """
+    Upload under the content-addressed name, skipping the upload entirely
+    when an object with the same bytes is already stored
+    """
+    storage_filename = content_addressed_name(prefix, sha256, ext)
+    if await object_exists(storage_filename, supabase_url, supabase_key):
+        logger.info(f"Dedup hit, skipping upload of {storage_filename}")
+        return storage_filename
+    return await upload_to_supabase(file_path, storage_filename, content_type, supabase_url, supabase_key)
+
+
+async def promote_staged_upload(staged_filename: str, sha256: str, prefix: str, ext: str,
+                                supabase_url: str, supabase_key: str) -> str:
+    """
+    Give an object uploaded under a temporary name its content-addressed name.
+
+    If the content is already stored the staged copy is dropped. Should the
+    move fail, the staged object is kept and its name returned.
+    """
+    storage_filename = content_addressed_name(prefix, sha256, ext)
+    if await object_exists(storage_filename, supabase_url, supabase_key):
+        logger.info(f"Dedup hit, dropping staged upload {staged_filename}")
+        await delete_object(staged_filename, supabase_url, supabase_key)
+        return storage_filename
+
+    try:
+        if await move_object(staged_filename, storage_filename, supabase_url, supabase_key):
+            return storage_filename
+    except Exception as e:
+        logger.warning(f"Move of {staged_filename} failed: {e}")
+
+    # A concurrent job may have stored the same content in the meantime
+    if await object_exists(storage_filename, supabase_url, supabase_key):
+        await delete_object(staged_filename, supabase_url, supabase_key)
+        return storage_filename
+    return staged_filename
+
+
+async def run_uploads(uploads: Dict[str, Awaitable[str]], limit: int = UPLOAD_CONCURRENCY) -> Tuple[dict, dict]:
+    """
+    Run named uploads concurrently, at most ``limit`` at a time.
+
+    Returns (results, timings): each result is the storage path or the
+    exception that upload raised, so one failure doesn't discard the rest.
+    Timings are in milliseconds.
+    """
+    semaphore = asyncio.Semaphore(limit)
+    timings = {}
+
+    async def _run(name: str, upload: Awaitable[str]) -> str:
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                return await upload
+            finally:
+                timings[name] = round((time.monotonic() - started) * 1000)
+
+    names = list(uploads)
+    outcomes = await asyncio.gather(*(_run(name, uploads[name]) for name in names), return_exceptions=True)
+    return dict(zip(names, outcomes)), timings
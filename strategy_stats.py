@@ -0,0 +1,104 @@
+"""
+Rolling success rate and latency per (platform, extraction method), used to
+try the method that currently works first
+"""
+
+import logging
+import os
+import random
+import statistics
+from collections import deque
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StrategyStats:
+    """
+    Keeps the last ``window`` outcomes of every (platform, method) pair.
+
+    ``order`` ranks comparable methods (the custom extractors) by success
+    rate (in ``rate_step`` buckets, so noise doesn't reshuffle them
+    constantly) and then by median latency. With probability ``explore`` the
+    order is shuffled instead, so methods that were failing get a chance to
+    show they recovered.
+
+    yt-dlp downloads the video while the custom extractors mostly return
+    metadata, so they are never ranked against each other; ``failing`` only
+    says whether a method's recent success rate has dropped below
+    ``failing_rate``.
+    """
+
+    def __init__(self, window: int = 50, explore: float = 0.05, rate_step: float = 0.1,
+                 failing_rate: float = 0.3, min_attempts: int = 5):
+        self.window = window
+        self.explore = explore
+        self.rate_step = rate_step
+        self.failing_rate = failing_rate
+        self.min_attempts = min_attempts
+        self._outcomes: Dict[Tuple[str, str], deque] = {}
+
+    @classmethod
+    def from_env(cls) -> 'StrategyStats':
+        return cls(
+            window=int(os.getenv('STRATEGY_WINDOW', 50)),
+            explore=float(os.getenv('STRATEGY_EXPLORE_RATE', 0.05)),
+            failing_rate=float(os.getenv('STRATEGY_FAILING_RATE', 0.3)),
+            min_attempts=int(os.getenv('STRATEGY_MIN_ATTEMPTS', 5)),
+        )
+
+    def record(self, platform: str, method: str, success: bool, latency: float):
+        outcomes = self._outcomes.get((platform, method))
+        if outcomes is None:
+            outcomes = self._outcomes[(platform, method)] = deque(maxlen=self.window)
+        outcomes.append((success, latency))
+
+    def success_rate(self, platform: str, method: str) -> float:
+        """
+        Smoothed success rate; a method without history counts as 50%
+        """
+        outcomes = self._outcomes.get((platform, method), ())
+        successes = sum(1 for success, _ in outcomes if success)
+        return (successes + 1) / (len(outcomes) + 2)
+
+    def median_latency(self, platform: str, method: str) -> float:
+        outcomes = self._outcomes.get((platform, method))
+        if not outcomes:
+            return float('inf')
+        return statistics.median(latency for _, latency in outcomes)
+
+    def failing(self, platform: str, method: str) -> bool:
+        """
+        Whether at least ``min_attempts`` recent attempts succeeded less than
+        ``failing_rate`` of the time; no history is not failing
+        """
+        outcomes = self._outcomes.get((platform, method), ())
+        if len(outcomes) < self.min_attempts:
+            return False
+        return sum(1 for success, _ in outcomes if success) / len(outcomes) < self.failing_rate
+
+    def order(self, platform: str, methods: List[str]) -> List[str]:
+        """
+        ``methods`` best first; ties keep their given order
+        """
+        if random.random() < self.explore:
+            explored = random.sample(methods, len(methods))
+            logger.info(f"Exploring {platform} strategy order: {explored}")
+            return explored
+
+        def _key(method: str):
+            bucket = int(self.success_rate(platform, method) / self.rate_step)
+            return (-bucket, self.median_latency(platform, method))
+
+        return sorted(methods, key=_key)
+
+    def stats(self) -> dict:
+        result = {}
+        for (platform, method), outcomes in self._outcomes.items():
+            latency = self.median_latency(platform, method)
+            result.setdefault(platform, {})[method] = {
+                'attempts': len(outcomes),
+                'success_rate': round(sum(1 for success, _ in outcomes if success) / len(outcomes), 3),
+                'median_latency_ms': round(latency * 1000),
+            }
+        return result
@@ -0,0 +1,135 @@
+"""
+Tee pipeline: forward a progressive download to storage while it is written to disk
+"""
+
+import hashlib
+import logging
+import queue
+import threading
+from typing import NamedTuple, Optional
+
+import httpx
+from yt_dlp.networking import Request
+
+from format_policy import check_downloaded_size
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+QUEUE_CHUNKS = 16  # at most ~4 MB buffered between download and upload
+
+_DONE = object()
+
+
+class TeeResult(NamedTuple):
+    uploaded: bool
+    sha256: str
+    size: int
+
+
+def is_progressive(info: dict) -> bool:
+    """
+    True when the selected format is a single file over plain HTTP(S),
+    i.e. nothing has to be merged or assembled from fragments
+    """
+    return (
+        not info.get('requested_formats')
+        and not info.get('fragments')
+        and info.get('protocol') in ('http', 'https')
+        and bool(info.get('url'))
+    )
+
+
+class _Producer(threading.Thread):
+    """
+    Reads the source URL, writes every chunk to disk and forwards it to the
+    upload queue until the upload side gives up
+    """
+
+    def __init__(self, ydl, info: dict, file_path: str, chunks: queue.Queue, upload_failed: threading.Event,
+                 max_bytes: Optional[int] = None):
+        super().__init__(name='tee-download', daemon=True)
+        self.ydl = ydl
+        self.info = info
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.chunks = chunks
+        self.upload_failed = upload_failed
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.error: Optional[BaseException] = None
+
+    def _forward(self, item):
+        while not self.upload_failed.is_set():
+            try:
+                self.chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def run(self):
+        try:
+            response = self.ydl.urlopen(Request(self.info['url'], headers=self.info.get('http_headers')))
+            check_downloaded_size(int(response.headers.get('Content-Length') or 0), self.max_bytes)
+            with open(self.file_path, 'wb') as f:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    self.size += len(chunk)
+                    check_downloaded_size(self.size, self.max_bytes)
+                    f.write(chunk)
+                    self.sha256.update(chunk)
+                    self._forward(chunk)
+            self._forward(_DONE)
+        except BaseException as e:
+            self.error = e
+            self._forward(e)
+
+
+def tee_download_upload(ydl, info: dict, file_path: str, client: httpx.Client, upload_url: str, headers: dict,
+                        max_bytes: Optional[int] = None) -> TeeResult:
+    """
+    Download ``info['url']`` to ``file_path`` and upload it at the same time.
+
+    ``uploaded`` is True when the upload succeeded. If the upload side fails
+    the download still completes on disk, so the caller can fall back to a
+    regular upload. The content hash is computed on the fly. Download errors
+    are raised, including FileTooLargeError once ``max_bytes`` is exceeded.
+    """
+    chunks = queue.Queue(maxsize=QUEUE_CHUNKS)
+    upload_failed = threading.Event()
+    producer = _Producer(ydl, info, file_path, chunks, upload_failed, max_bytes)
+
+    def body():
+        while True:
+            item = chunks.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    producer.start()
+    uploaded = False
+    try:
+        # A generator body is sent with chunked transfer encoding
+        upload_headers = {k: v for k, v in headers.items() if k.lower() != 'content-length'}
+        response = client.post(upload_url, headers=upload_headers, content=body(), timeout=None)
+        if response.status_code in [200, 201]:
+            uploaded = True
+        else:
+            logger.warning(f"Tee upload failed: {response.status_code} - {response.text}")
+    except Exception as e:
+        if producer.error is None:
+            logger.warning(f"Tee upload failed, falling back to disk upload: {e}")
+    finally:
+        if not uploaded:
+            upload_failed.set()
+        producer.join()
+
+    if producer.error is not None:
+        raise producer.error
+
+    logger.info(f"Tee download finished: {producer.size} bytes, uploaded while downloading: {uploaded}")
+    return TeeResult(uploaded, producer.sha256.hexdigest(), producer.size)
@@ -0,0 +1,176 @@
+"""
+Resized thumbnail renditions, rendered in a process pool off the event loop
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, NamedTuple, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # renditions disabled, the raw thumbnail is uploaded instead
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Storage extension and content type per output format
+FORMATS = {
+    'webp': ('webp', 'image/webp'),
+    'jpeg': ('jpg', 'image/jpeg'),
+}
+
+# Encoder settings: compression effort over speed, renditions are written once
+SAVE_OPTIONS = {
+    'webp': {'method': 4},
+    'jpeg': {'optimize': True, 'progressive': True},
+}
+
+# Content types of the raw thumbnails yt-dlp writes, by extension
+RAW_CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'gif': 'image/gif',
+}
+
+
+class Rendition(NamedTuple):
+    file_path: str
+    sha256: str
+    width: int
+    height: int
+    format: str  # key of FORMATS
+
+    @property
+    def ext(self) -> str:
+        return FORMATS[self.format][0]
+
+    @property
+    def content_type(self) -> str:
+        return FORMATS[self.format][1]
+
+
+def _parse_list(raw: str) -> List[str]:
+    return [item.strip().lower() for item in raw.split(',') if item.strip()]
+
+
+def render_renditions(source_path: str, widths: Tuple[int, ...], formats: Tuple[str, ...],
+                      quality: int) -> List[Rendition]:
+    """
+    Decode ``source_path`` once and write it at each width (never upscaled)
+    in each format next to the source. Runs in a pool process.
+    """
+    base, _ = os.path.splitext(source_path)
+    renditions = []
+    with Image.open(source_path) as image:
+        image.draft('RGB', (max(widths), 1))  # JPEG: decode at reduced scale when the widths allow
+        image = image.convert('RGB')
+        done = set()
+        for width in sorted(widths):
+            width = min(width, image.width)
+            if width in done:
+                continue
+            done.add(width)
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for format in formats:
+                file_path = f"{base}_{width}.{FORMATS[format][0]}"
+                resized.save(file_path, format=format.upper(), quality=quality, **SAVE_OPTIONS[format])
+                with open(file_path, 'rb') as f:
+                    sha256 = hashlib.sha256(f.read()).hexdigest()
+                renditions.append(Rendition(file_path, sha256, width, height, format))
+    return renditions
+
+
+class ThumbnailRenderer:
+    """
+    Renders configured renditions of downloaded thumbnails in a pool of
+    processes, so decoding and resizing never holds the GIL of the API process
+    """
+
+    def __init__(self, widths: Tuple[int, ...], formats: Tuple[str, ...], quality: int = 80, max_workers: int = 2):
+        self.widths = widths
+        self.formats = formats
+        self.quality = quality
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls) -> 'ThumbnailRenderer':
+        widths = []
+        for item in _parse_list(os.getenv('THUMBNAIL_WIDTHS', '160,320,640')):
+            try:
+                widths.append(max(1, int(item)))
+            except ValueError:
+                logger.warning(f"Ignoring invalid thumbnail width: {item}")
+        formats = []
+        for item in _parse_list(os.getenv('THUMBNAIL_FORMATS', 'webp,jpeg')):
+            item = 'jpeg' if item == 'jpg' else item
+            if item in FORMATS:
+                formats.append(item)
+            else:
+                logger.warning(f"Ignoring unsupported thumbnail format: {item}")
+        return cls(
+            tuple(widths),
+            tuple(formats),
+            quality=int(os.getenv('THUMBNAIL_QUALITY', 80)),
+            max_workers=int(os.getenv('THUMBNAIL_WORKERS', min(4, os.cpu_count() or 1))),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and bool(self.widths) and bool(self.formats)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def start(self):
+        """
+        Fork the pool's processes now, at startup, before worker threads exist
+        (spawned processes would re-import the whole app instead)
+        """
+        if self.enabled:
+            self._get_pool().submit(os.getpid).result()
+
+    async def render(self, source_path: str) -> List[Rendition]:
+        """
+        Renditions of ``source_path``, smallest first
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._get_pool(), render_renditions, source_path, self.widths, self.formats, self.quality
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge image): start a fresh pool next time
+            self.shutdown()
+            raise
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'widths': list(self.widths),
+            'formats': list(self.formats),
+            'workers': self.max_workers,
+        }
+
+
+def raw_content_type(file_path: str) -> Tuple[str, str]:
+    """
+    (extension, content type) of a thumbnail uploaded as downloaded
+    """
+    ext = os.path.splitext(file_path)[1].lstrip('.').lower()
+    ext = 'jpg' if ext == 'jpeg' else ext
+    return ext, RAW_CONTENT_TYPES.get(ext, 'application/octet-stream')
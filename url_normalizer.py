@@ -0,0 +1,200 @@
+"""
+Canonical URL normalization and (platform, video_id) keys for supported platforms
+"""
+
+import logging
+import re
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from http_client import http_clients
+
+logger = logging.getLogger(__name__)
+
+# Hostname (without "www."/mobile prefixes) -> platform
+PLATFORM_HOSTS = {
+    'tiktok.com': 'tiktok',
+    'instagram.com': 'instagram',
+    'instagr.am': 'instagram',
+    'facebook.com': 'facebook',
+    'fb.com': 'facebook',
+    'fb.watch': 'facebook',
+    'twitter.com': 'x',
+    'x.com': 'x',
+    't.co': 'x',
+}
+
+# Canonical host per platform
+CANONICAL_HOSTS = {
+    'tiktok': 'www.tiktok.com',
+    'instagram': 'www.instagram.com',
+    'facebook': 'www.facebook.com',
+    'x': 'x.com',
+}
+
+HOST_PREFIX_RE = re.compile(r'^(?:www|m|mobile|mbasic|web|touch|vm|vt)\.')
+
+# Hosts whose URLs don't have the same paths on the canonical host
+KEEP_HOST_RE = re.compile(r'^m\.tiktok\.com$', re.IGNORECASE)
+
+# Links that only redirect to the real video URL
+SHORT_LINK_RE = re.compile(
+    r'^https?://(?:'
+    r'(?:vm|vt)\.tiktok\.com/'
+    r'|(?:www\.|m\.)?tiktok\.com/t/'
+    r'|fb\.watch/'
+    r'|(?:www\.|m\.)?facebook\.com/share/'
+    r'|t\.co/'
+    r')',
+    re.IGNORECASE,
+)
+
+VIDEO_ID_PATTERNS = {
+    'tiktok': [
+        re.compile(r'/video/(\d+)'),
+        re.compile(r'/v/(\d+)'),
+    ],
+    'instagram': [
+        re.compile(r'^/(?:[\w.]+/)?(?:p|reels?|tv)/([A-Za-z0-9_-]+)'),
+    ],
+    'facebook': [
+        re.compile(r'/videos/(?:[^/]+/)?(\d+)'),
+        re.compile(r'/reels?/(\d+)'),
+        re.compile(r'[?&](?:v|video_id)=(\d+)'),
+        re.compile(r'[?&]story_fbid=(\d+)'),
+    ],
+    'x': [
+        re.compile(r'/status(?:es)?/(\d+)'),
+    ],
+}
+
+# Query parameters that identify the video; everything else is tracking noise
+KEEP_PARAMS = {
+    'facebook': {'v', 'video_id', 'story_fbid', 'id'},
+}
+
+
+class VideoKey(NamedTuple):
+    platform: str
+    video_id: str
+    url: str
+
+
+def _bare_host(host: str) -> str:
+    host = (host or '').lower().rstrip('.')
+    return HOST_PREFIX_RE.sub('', host)
+
+
+def detect_platform(url: str) -> str:
+    """
+    Platform for a URL by hostname, 'unknown' if unsupported
+    """
+    if '://' not in url:
+        url = 'https://' + url
+    host = _bare_host(urllib.parse.urlsplit(url.strip()).hostname)
+    while host:
+        platform = PLATFORM_HOSTS.get(host)
+        if platform:
+            return platform
+        host = host.partition('.')[2]
+    return 'unknown'
+
+
+def normalize_url(url: str, platform: Optional[str] = None) -> str:
+    """
+    Canonical host, no tracking parameters, no fragment, no trailing slash
+    """
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url
+    platform = platform or detect_platform(url)
+    parts = urllib.parse.urlsplit(url)
+
+    host = parts.hostname or ''
+    if platform in CANONICAL_HOSTS and not SHORT_LINK_RE.match(url) and not KEEP_HOST_RE.match(host):
+        host = CANONICAL_HOSTS[platform]
+
+    keep = KEEP_PARAMS.get(platform, set())
+    query = urllib.parse.urlencode(
+        [(k, v) for k, v in urllib.parse.parse_qsl(parts.query) if k in keep]
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urllib.parse.urlunsplit(('https', host.lower(), path, query, ''))
+
+
+def parse_video_key(url: str) -> Optional[VideoKey]:
+    """
+    (platform, video_id) for a full video URL, without any network access
+    """
+    platform = detect_platform(url)
+    if platform == 'unknown':
+        return None
+
+    normalized = normalize_url(url, platform)
+    parts = urllib.parse.urlsplit(normalized)
+    target = parts.path + ('?' + parts.query if parts.query else '')
+    for pattern in VIDEO_ID_PATTERNS[platform]:
+        match = pattern.search(target)
+        if match:
+            return VideoKey(platform, match.group(1), normalized)
+    return None
+
+
+def is_short_link(url: str) -> bool:
+    return bool(SHORT_LINK_RE.match(url.strip()))
+
+
+class ShortLinkResolver:
+    """
+    Follows short-link redirects, caching the destination for ``ttl`` seconds
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._cache = OrderedDict()
+
+    async def resolve(self, url: str) -> str:
+        entry = self._cache.get(url)
+        if entry and time.time() - entry[0] < self.ttl:
+            self._cache.move_to_end(url)
+            return entry[1]
+
+        try:
+            response = await http_clients.shared().head(url, follow_redirects=True, timeout=5)
+            resolved = str(response.url)
+        except Exception as e:
+            logger.warning(f"Could not resolve short link {url}: {e}")
+            return url
+
+        self._cache[url] = (time.time(), resolved)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return resolved
+
+
+short_links = ShortLinkResolver()
+
+
+async def resolve_video_key(url: str) -> Optional[VideoKey]:
+    """
+    Canonical key for any supported URL, following short links when needed.
+
+    URLs whose ID can't be parsed still get a stable key from their
+    normalized form, so they can be cached and coalesced.
+    """
+    if is_short_link(url):
+        url = await short_links.resolve(url)
+
+    key = parse_video_key(url)
+    if key:
+        return key
+
+    platform = detect_platform(url)
+    if platform == 'unknown':
+        return None
+    normalized = normalize_url(url, platform)
+    parts = urllib.parse.urlsplit(normalized)
+    return VideoKey(platform, f"{parts.netloc}{parts.path}{'?' + parts.query if parts.query else ''}", normalized)
@@ -0,0 +1,155 @@
+"""
+Bounded worker pool for blocking extraction work (yt-dlp runs, storage uploads)
+"""
+
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PLATFORM_LIMITS = {
+    'tiktok': 8,
+    'instagram': 8,
+    'facebook': 8,
+    'x': 8,
+}
+
+
+class QueueFullError(Exception):
+    """Raised when the extraction queue has no room for another job"""
+
+
+def parse_platform_limits(raw: Optional[str], defaults: Dict[str, int] = DEFAULT_PLATFORM_LIMITS) -> Dict[str, int]:
+    """
+    Parse a "platform=limit,platform=limit" string into a dict
+    """
+    limits = dict(defaults)
+    if not raw:
+        return limits
+
+    for item in raw.split(','):
+        if '=' not in item:
+            continue
+        platform, value = item.split('=', 1)
+        try:
+            limits[platform.strip().lower()] = max(1, int(value))
+        except ValueError:
+            logger.warning(f"Ignoring invalid platform limit: {item}")
+    return limits
+
+
+async def _wait_uninterrupted(future: Future):
+    """
+    Wait until ``future`` is done, ignoring further cancellation; its result
+    or exception is dropped
+    """
+    waiter = asyncio.wrap_future(future)
+    while not waiter.done():
+        try:
+            await asyncio.wait({waiter})
+        except asyncio.CancelledError:
+            pass
+    if not waiter.cancelled():
+        waiter.exception()
+
+
+class ExtractionExecutor:
+    """
+    Runs extraction jobs off the event loop.
+
+    Admission is bounded: at most ``max_workers + queue_size`` jobs may be
+    running or waiting at once, anything beyond that is rejected with
+    ``QueueFullError`` so callers can shed load instead of piling up.
+    Each platform additionally gets its own concurrency cap.
+    """
+
+    def __init__(self, max_workers: int = 32, queue_size: int = 64,
+                 platform_limits: Optional[Dict[str, int]] = None,
+                 default_platform_limit: int = 4):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.platform_limits = platform_limits or dict(DEFAULT_PLATFORM_LIMITS)
+        self.default_platform_limit = default_platform_limit
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extract')
+        self._platform_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._admitted = 0
+        self._running: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> 'ExtractionExecutor':
+        """
+        Build an executor from EXTRACT_* environment variables
+        """
+        return cls(
+            max_workers=int(os.getenv('EXTRACT_WORKERS', 32)),
+            queue_size=int(os.getenv('EXTRACT_QUEUE_SIZE', 64)),
+            platform_limits=parse_platform_limits(os.getenv('EXTRACT_PLATFORM_LIMITS')),
+            default_platform_limit=int(os.getenv('EXTRACT_DEFAULT_PLATFORM_LIMIT', 4)),
+        )
+
+    def _semaphore_for(self, platform: str) -> asyncio.Semaphore:
+        semaphore = self._platform_semaphores.get(platform)
+        if semaphore is None:
+            limit = self.platform_limits.get(platform, self.default_platform_limit)
+            semaphore = asyncio.Semaphore(limit)
+            self._platform_semaphores[platform] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self, platform: str):
+        """
+        Reserve a job slot for ``platform``, waiting for its concurrency cap
+        """
+        if self._admitted >= self.max_workers + self.queue_size:
+            raise QueueFullError(
+                f"Extraction queue is full ({self._admitted} jobs), try again later"
+            )
+
+        self._admitted += 1
+        try:
+            async with self._semaphore_for(platform):
+                self._running[platform] = self._running.get(platform, 0) + 1
+                try:
+                    yield
+                finally:
+                    self._running[platform] -= 1
+        finally:
+            self._admitted -= 1
+
+    async def run_blocking(self, func: Callable, *args, **kwargs):
+        """
+        Run a blocking callable in the worker pool and await its result.
+
+        Cancelling the caller cancels the call only if it hasn't started.
+        A running thread can't be interrupted, so the caller waits for it
+        before the CancelledError goes on: the slot, scratch directory and
+        anything else the caller holds stay held while the thread still
+        uses them.
+        """
+        future = self._pool.submit(functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            if not future.cancel():
+                logger.info(f"Cancelled while {getattr(func, '__name__', func)} runs, waiting for it to finish")
+                await _wait_uninterrupted(future)
+            raise
+
+    def stats(self) -> dict:
+        running = sum(self._running.values())
+        return {
+            'max_workers': self.max_workers,
+            'queue_size': self.queue_size,
+            'admitted': self._admitted,
+            'running': running,
+            'queued': self._admitted - running,
+            'running_by_platform': {k: v for k, v in self._running.items() if v},
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,176 @@
+"""
+Pool of pre-warmed YoutubeDL instances, checked out per extraction job
+"""
+
+import http.cookiejar
+import json
+import logging
+import os
+import threading
+import urllib.parse
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+import yt_dlp
+from yt_dlp.utils.networking import HTTPHeaderDict, std_headers
+
+from format_policy import MAX_DOWNLOAD_BYTES, install_size_guard
+
+logger = logging.getLogger(__name__)
+
+# Options that change from job to job and are re-applied on every checkout
+PER_JOB_OPTIONS = ('outtmpl', 'http_headers', 'user_agent', 'format', 'format_sort', MAX_DOWNLOAD_BYTES)
+
+
+def _pool_key(platform: str, options: dict) -> str:
+    """
+    Instances can only be shared between jobs whose static options match
+    """
+    static = {k: v for k, v in options.items() if k not in PER_JOB_OPTIONS}
+    return f"{platform}:{json.dumps(static, sort_keys=True, default=str)}"
+
+
+def _split_cookie_header(headers: dict) -> Tuple[dict, Dict[str, str]]:
+    """
+    Separate the Cookie header from the rest so it can go into the cookie jar
+    """
+    headers = dict(headers or {})
+    cookies = {}
+    cookie_header = headers.pop('Cookie', None)
+    if cookie_header:
+        for part in cookie_header.split(';'):
+            if '=' in part:
+                name, value = part.split('=', 1)
+                cookies[name.strip()] = value.strip()
+    return headers, cookies
+
+
+class _PooledYoutubeDL:
+    def __init__(self, ydl: yt_dlp.YoutubeDL):
+        self.ydl = ydl
+        self.uses = 0
+
+
+class YoutubeDLPool:
+    """
+    Keeps idle YoutubeDL instances per platform so extractors, the opener and
+    the cookie jar are initialised once instead of on every attempt.
+
+    Instances are reset on checkout (output template, headers, cookies) and
+    closed after ``max_uses`` jobs or after a job that raised.
+    """
+
+    def __init__(self, max_idle: int = 4, max_uses: int = 50):
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self._idle: Dict[str, List[_PooledYoutubeDL]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @classmethod
+    def from_env(cls) -> 'YoutubeDLPool':
+        return cls(
+            max_idle=int(os.getenv('YTDLP_POOL_SIZE', 4)),
+            max_uses=int(os.getenv('YTDLP_POOL_MAX_USES', 50)),
+        )
+
+    def _create(self, options: dict) -> _PooledYoutubeDL:
+        params = dict(options)
+        params['http_headers'], _ = _split_cookie_header(options.get('http_headers'))
+        self.created += 1
+        ydl = yt_dlp.YoutubeDL(params)
+        install_size_guard(ydl)
+        return _PooledYoutubeDL(ydl)
+
+    def _acquire(self, key: str, options: dict) -> _PooledYoutubeDL:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+        return self._create(options)
+
+    def _release(self, key: str, pooled: _PooledYoutubeDL, healthy: bool):
+        pooled.uses += 1
+        if healthy and pooled.uses < self.max_uses:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle:
+                    idle.append(pooled)
+                    return
+        self._close(pooled)
+
+    @staticmethod
+    def _close(pooled: _PooledYoutubeDL):
+        try:
+            pooled.ydl.close()
+        except Exception as e:
+            logger.warning(f"Failed to close pooled YoutubeDL: {e}")
+
+    @staticmethod
+    def _prepare(ydl: yt_dlp.YoutubeDL, options: dict, url: str):
+        """
+        Apply the per-job output template, headers, cookies and format policy
+        """
+        headers, cookies = _split_cookie_header(options.get('http_headers'))
+        ydl.params['outtmpl']['default'] = options['outtmpl']
+        ydl.params['http_headers'] = HTTPHeaderDict(std_headers, headers)
+        if options.get('user_agent'):
+            ydl.params['user_agent'] = options['user_agent']
+
+        # The format selector is parsed once at construction; rebuild it
+        # only when this job asks for a different format
+        if options.get('format') and options['format'] != ydl.params.get('format'):
+            ydl.params['format'] = options['format']
+            ydl.format_selector = ydl.build_format_selector(options['format'])
+        ydl.params['format_sort'] = options.get('format_sort') or []
+        ydl.params[MAX_DOWNLOAD_BYTES] = options.get(MAX_DOWNLOAD_BYTES)
+
+        ydl.cookiejar.clear()
+        host = urllib.parse.urlparse(url).hostname or ''
+        domain = '.' + host[4:] if host.startswith('www.') else '.' + host
+        for name, value in cookies.items():
+            ydl.cookiejar.set_cookie(http.cookiejar.Cookie(
+                0, name, value, None, False, domain, True, True, '/', False,
+                False, None, False, None, None, {}))
+
+    @contextmanager
+    def checkout(self, platform: str, options: dict, url: str):
+        """
+        Borrow a YoutubeDL configured for this job
+        """
+        key = _pool_key(platform, options)
+        pooled = self._acquire(key, options)
+        healthy = False
+        try:
+            self._prepare(pooled.ydl, options, url)
+            yield pooled.ydl
+            healthy = True
+        finally:
+            self._release(key, pooled, healthy)
+
+    def warm(self, platform: str, options: dict):
+        """
+        Pre-create one idle instance for ``platform``
+        """
+        key = _pool_key(platform, options)
+        pooled = self._create(options)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(pooled)
+                return
+        self._close(pooled)
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = sum(len(v) for v in self._idle.values())
+        return {'idle': idle, 'created': self.created, 'reused': self.reused}
+
+    def close(self):
+        with self._lock:
+            pools, self._idle = self._idle, {}
+        for idle in pools.values():
+            for pooled in idle:
+                self._close(pooled)